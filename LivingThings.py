@@ -1,53 +1,155 @@
 import math
-import uuid
 import random
 from ursina import *
+from occupancy import OccupancyGrid, EMPTY
 
 class LivingThing(Entity):
-    entity_grid = {}  # Shared across all living things
-    time_scale = 1.0  # Class-level timescale
+    occupancy = OccupancyGrid()  # Shared across all living things: who stands in which cell
+    clock = None  # Shared SimClock (OasisII/sim_clock.py), advanced once per frame by the game loop
+    renderer = None  # Optional InstancedRenderer (instancing.py) that batches all living things
+    scheduler = None  # Optional Scheduler (scheduler.py) on clock time; fires deaths and sleep/wake flips
+    system = None  # Optional LivingSystem (living_systems.py) that updates all living things in one batch
 
     def __init__(self, position, lifespan, water, nutrition, **kwargs):
         super().__init__(position=position, **kwargs)
         self.collider = 'box'
         self.cast_shadows = True  # Add this!
-        self.lifespan = lifespan
         self.water = water
         self.nutrition = nutrition
-        self.age = 0
+        self.local_time = 0.0  # Simulation time counted by this thing itself when there is no clock
+        self.events = {}  # Name -> pending scheduler Event
+        self.batched = False  # Whether a LivingBatch (living_systems.py) owns the state for now
         self.destroyed = False
-        self.unique_id = str(uuid.uuid4())
-        self.grid_key = (round(position.x), round(position.z))
-        self.update_grid()
-
-    def update_grid(self):
-        self.entity_grid[self.grid_key] = [self.grid_key, self.unique_id, self.enabled]
+        self.birth_time = self.sim_time()
+        self.lifespan = lifespan
+        self.handle = self.occupancy.register(self)
+        self.cell = self.occupancy.cell(position.x, position.z)
+        self.occupancy.place(self.handle, self.cell)
+
+    def batch(self):
+        """Hands this thing's parts to the instanced renderer, if one is installed."""
+        if self.renderer is not None:
+            self.renderer.add(self)
+
+    def redraw(self):
+        """Tells the instanced renderer, if one is installed, that this thing moved or changed."""
+        if self.renderer is not None:
+            self.renderer.touch(self)
+
+    def on_enable(self):
+        if self.renderer is not None:
+            self.renderer.show(self)
+
+    def on_disable(self):
+        if self.renderer is not None:
+            self.renderer.hide(self)
+
+    def join_system(self):
+        """Hands this thing's updates to the batched LivingSystem, if one is installed."""
+        if self.system is not None:
+            self.system.add(self)
+
+    @property
+    def age(self):
+        return self.sim_time() - self.birth_time
+
+    @property
+    def lifespan(self):
+        """Simulation seconds left to live."""
+        return self.death_time - self.sim_time()
+
+    @lifespan.setter
+    def lifespan(self, value):
+        self.death_time = self.sim_time() + value
+        self.schedule('death', self.death_time, LivingThing.expire)
+
+    def schedule(self, name, when, callback):
+        """
+        Schedules callback([self, ...]) at simulation time `when` on the shared scheduler,
+        replacing the pending event of the same name. Without a scheduler, nothing is scheduled
+        and the per-step countdowns apply instead; while batched, the batch keeps the time.
+        """
+        previous = self.events.pop(name, None)
+        if previous is not None:
+            previous.cancel()
+        if self.scheduler is not None and not self.batched:
+            self.events[name] = self.scheduler.schedule(when, callback, self)
+
+    @staticmethod
+    def expire(things):
+        for thing in things:
+            if not thing.destroyed:
+                thing.destroy()
+
+    def wants_update(self):
+        """Whether update() has per-step work to do; things that don't are left out of Ursina's loop."""
+        return not self.batched and self.scheduler is None
 
     def update(self):
         if not self.enabled or self.destroyed:
             return
-        dt = time.dt * self.time_scale
-        self.lifespan -= dt
-        self.age += dt
-        if self.lifespan <= 0:
+        if self.clock is None:
+            self.local_time += time.dt
+            self.tick(time.dt)
+            if not self.destroyed:
+                self.redraw()
+            return
+        # Run the fixed steps the clock paid out this frame
+        for _ in range(self.clock.steps):
+            self.tick(self.clock.step)
+            if self.destroyed:
+                return
+        if self.clock.steps:
+            self.redraw()
+
+    def sim_time(self):
+        """Current simulation time: the shared clock's, or this thing's own count without one."""
+        return self.clock.time if self.clock is not None else self.local_time
+
+    @staticmethod
+    def approach(start, end, rate, t):
+        """
+        Value after `t` seconds of closing the gap from `start` to `end` at `rate` per second:
+        the closed form of lerping toward `end` by rate * dt every step.
+        """
+        return end + (start - end) * math.exp(-rate * max(t, 0.0))
+
+    def refresh(self):
+        """Brings state derived from the simulation time (growth) up to date on the entity."""
+        pass
+
+    def tick(self, dt):
+        if self.scheduler is None and self.lifespan <= 0:
             self.destroy()
         else:
             self.step(dt)
 
     def step(self, dt):
-        self.grow()
-
-    def grow(self):
         pass
 
+    def cancel_events(self):
+        for event in self.events.values():
+            event.cancel()
+        self.events.clear()
+
     def destroy(self):
         self.destroyed = True
         self.enabled = False
+        self.cancel_events()
+        if self.renderer is not None:
+            self.renderer.remove(self)
         destroy(self)
-        if self.grid_key in self.entity_grid:
-            del self.entity_grid[self.grid_key]
+        self.occupancy.unregister(self.handle, self.cell)
 
 class Tree(LivingThing):
+    START_FOLIAGE_SCALE = Vec3(0.5, 0.25, 0.5)
+    START_TRUNK_SCALE = Vec3(0.1, 0.5, 0.1)
+    MAX_FOLIAGE_SCALE = Vec3(2, 5, 2)
+    MAX_TRUNK_SCALE = Vec3(0.5, 4, 0.5)
+    GROWTH_RATE = 0.01  # Fraction of the remaining growth per simulation second
+    GROWTH_REFRESH_STEP = 10.0  # Simulation seconds between scheduled growth refreshes
+    GROWN_AGE = math.log(100) / GROWTH_RATE  # Age by which 99% of the growth is done
+
     def __init__(self, position, **kwargs):
         super().__init__(
             position=position,
@@ -60,7 +162,7 @@ class Tree(LivingThing):
             parent=self,
             model='cube',
             color=color.brown,
-            scale=Vec3(0.1, 0.5, 0.1),
+            scale=self.START_TRUNK_SCALE,
             position=Vec3(0, 0.25, 0),
             cast_shadows=True,
             receive_shadows=True
@@ -69,23 +171,54 @@ class Tree(LivingThing):
             parent=self,
             model='cube',
             color=color.green,
-            scale=Vec3(0.5, 0.25, 0.5),
+            scale=self.START_FOLIAGE_SCALE,
             position=Vec3(0, 1, 0),
             cast_shadows=True,
             receive_shadows=True
         )
+        self.ignore = not self.wants_update()  # Growth is closed-form and death is scheduled
+        self.schedule_growth()
+        self.batch()
+        self.join_system()
+
+    def size_at(self, t):
+        """(trunk scale, foliage scale) at simulation time `t`; growth needs no per-frame work."""
+        age = t - self.birth_time
+        return (self.approach(self.START_TRUNK_SCALE, self.MAX_TRUNK_SCALE, self.GROWTH_RATE, age),
+                self.approach(self.START_FOLIAGE_SCALE, self.MAX_FOLIAGE_SCALE, self.GROWTH_RATE, age))
+
+    def refresh(self):
+        trunk, foliage = self.size_at(self.sim_time())
+        self.trunk.scale = trunk
+        self.foliage.scale = foliage
+        self.foliage.position = Vec3(0, trunk.y, 0)
+        self.redraw()
+        self.schedule_growth()
+
+    def schedule_growth(self):
+        """Schedules the next growth refresh, until the tree is as good as grown."""
+        if self.age < self.GROWN_AGE:
+            self.schedule('grow', self.sim_time() + self.GROWTH_REFRESH_STEP, Tree.grow)
+
+    @staticmethod
+    def grow(trees):
+        for tree in trees:
+            if not tree.destroyed:
+                tree.refresh()
 
-    def grow(self):
-        max_size_foliage = Vec3(2, 5, 2)
-        max_size_trunk = Vec3(0.5, 4, 0.5)
-        self.foliage.scale = lerp(self.foliage.scale, max_size_foliage, time.dt * self.time_scale * 0.01)
-        self.trunk.scale = lerp(self.trunk.scale, max_size_trunk, time.dt * self.time_scale * 0.01)
-        self.foliage.position = Vec3(0, self.trunk.scale.y, 0)
+    def step(self, dt):
+        if self.scheduler is None:
+            self.refresh()  # No scheduler to time growth refreshes: keep up every step
 
 class Animal(LivingThing):
     MAX_ALLOWED_DT = 0.1
     POSITION_LIMIT = 1000
     SAFE_ZONE = (-50, 50)
+    MAX_SCALE = Vec3(1, 1, 1)
+    GROWTH_RATE = 0.02
+    AWAKE_TIME = 10
+    SLEEP_TIME = 5
+    MAX_EYE_ANGLE = 45
 
     def __init__(self, position, animal_type='prey', **kwargs):
         scale = Vec3(0.3, 0.3, 0.3) if animal_type == 'prey' else Vec3(1.7, 1.7, 1.7)
@@ -106,19 +239,19 @@ class Animal(LivingThing):
             receive_shadows=True,
             **kwargs
         )
+        self.start_scale = scale
         self.speed_range = (2, 8)
         self.rotation_speed_range = (45, 180)
         self.target = safe_position
         self.moving = False
-        self.sleeping = False
-        self.sleep_time_left = 0
-        self.awake_time_left = 10
+        self.set_sleeping(False)
         self.target_rotation_y = self.rotation_y % 360
-        self.max_eye_angle = 45
+        self.max_eye_angle = self.MAX_EYE_ANGLE
         self.look_target = None
         self.update_attributes()
 
-        # Eye initialization (with names so update_eyes can find them)
+        # Eye initialization (named, and listed in self.eyes for update_eyes)
+        self.eyes = []
         eye_scale = 0.3
         eye_y_offset = 0.6
         eye_x_offset = 0.15
@@ -139,6 +272,9 @@ class Animal(LivingThing):
                 scale=0.5,
                 position=Vec3(0, 0, 0.35)
             )
+            self.eyes.append(eye)
+        self.batch()
+        self.join_system()
 
     def validate_position(self, pos):
         if any(math.isnan(v) or abs(v) > self.POSITION_LIMIT for v in pos):
@@ -157,23 +293,45 @@ class Animal(LivingThing):
         self.rotation_speed = lerp(self.rotation_speed_range[0],
                                    self.rotation_speed_range[1], lifespan_factor)
 
+    @property
+    def sleep_time_left(self):
+        return max(self.flip_time - self.sim_time(), 0.0) if self.sleeping else 0.0
+
+    @property
+    def awake_time_left(self):
+        return 0.0 if self.sleeping else max(self.flip_time - self.sim_time(), 0.0)
+
+    def set_sleeping(self, sleeping, duration=None, start=None):
+        """
+        Puts the animal to sleep or wakes it for `duration` simulation seconds (SLEEP_TIME or
+        AWAKE_TIME by default) from `start` (now by default), and schedules the next flip.
+        """
+        if duration is None:
+            duration = self.SLEEP_TIME if sleeping else self.AWAKE_TIME
+        self.sleeping = sleeping
+        self.flip_time = (self.sim_time() if start is None else start) + duration
+        self.schedule('flip', self.flip_time, Animal.flip)
+        self.ignore = not self.wants_update()
+
+    @staticmethod
+    def flip(animals):
+        for animal in animals:
+            if not animal.destroyed:
+                animal.set_sleeping(not animal.sleeping, start=animal.flip_time)
+
+    def wants_update(self):
+        # Sleeping animals have nothing to do until the scheduler wakes them
+        return not self.batched and (self.scheduler is None or not self.sleeping)
+
     def step(self, dt):
         dt = min(dt, self.MAX_ALLOWED_DT)
         self.update_attributes()
-        self.grow()
 
-        if self.sleeping:
-            self.sleep_time_left -= dt
-            if self.sleep_time_left <= 0:
-                self.sleeping = False
-                self.awake_time_left = 10
-        else:
+        if self.scheduler is None and self.sim_time() >= self.flip_time:
+            Animal.flip([self])
+        if not self.sleeping:
             self.update_movement(dt)
             self.update_eyes(dt)
-            self.awake_time_left -= dt
-            if self.awake_time_left <= 0:
-                self.sleeping = True
-                self.sleep_time_left = 5
 
     def update_movement(self, dt):
         if not self.target:
@@ -203,15 +361,13 @@ class Animal(LivingThing):
             new_position = self.position + self.forward * self.speed * dt
             new_position = self.validate_position(new_position)
 
-            new_key = (round(new_position.x), round(new_position.z))
-            if new_key in self.entity_grid and self.entity_grid[new_key][1] != self.unique_id:
+            new_cell = self.occupancy.cell(new_position.x, new_position.z)
+            if self.occupancy.occupant(new_cell) not in (EMPTY, self.handle):
                 self.target = self.position - self.forward * 5
             else:
-                if self.grid_key in self.entity_grid:
-                    del self.entity_grid[self.grid_key]
                 self.position = new_position
-                self.grid_key = new_key
-                self.entity_grid[self.grid_key] = [self.grid_key, self.unique_id, self.enabled]
+                self.occupancy.move(self.handle, self.cell, new_cell)
+                self.cell = new_cell
 
     def generate_safe_target(self):
         return Vec3(
@@ -242,13 +398,16 @@ class Animal(LivingThing):
         yaw = clamp(yaw, -self.max_eye_angle, self.max_eye_angle)
         pitch = clamp(pitch, -self.max_eye_angle, self.max_eye_angle)
 
-        for eye in self.children:
-            if 'eye' in eye.name:
-                eye.rotation_y = lerp(eye.rotation_y, yaw, dt * 5)
-                eye.rotation_x = lerp(eye.rotation_x, -pitch, dt * 5)
+        for eye in self.eyes:
+            eye.rotation_y = lerp(eye.rotation_y, yaw, dt * 5)
+            eye.rotation_x = lerp(eye.rotation_x, -pitch, dt * 5)
 
-    def grow(self):
-        max_size = Vec3(1, 1, 1)
-        growth_factor = clamp(time.dt * self.time_scale * 0.02, 0, 0.1)
-        self.scale = lerp(self.scale, max_size, growth_factor)
-        self.scale = self.validate_position(self.scale)
+    def update(self):
+        super().update()
+        if not self.destroyed:
+            self.refresh()
+
+    def refresh(self):
+        self.scale = self.approach(self.start_scale, self.MAX_SCALE, self.GROWTH_RATE,
+                                   self.sim_time() - self.birth_time)
+        self.redraw()
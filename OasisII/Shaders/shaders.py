@@ -276,40 +276,54 @@ water_shader = Shader(
 )
 
 hologram = Shader(
-# Vertex shader
-vertex_shader = """
+language=Shader.GLSL,
+# Vertex shader: one instance per entity. Instance data comes from a buffer texture
+# (see instance_buffer.py), two texels per instance:
+#   texel 0: position xyz, model type (0 cube, 1 sphere, 2 cone, 3 cylinder)
+#   texel 1: color rgb, scale
+vertex="""
 #version 330 core
-#define MAX_INSTANCES 10000
 
-layout(location = 0) in vec3 in_position;
-layout(location = 1) in int in_model_type;
-layout(location = 2) in vec3 in_color;
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform samplerBuffer instance_data;
+uniform vec3 player_position;
+uniform float hologram_radius;
 
-uniform vec3 instance_offset[MAX_INSTANCES];
-uniform int instance_model_type[MAX_INSTANCES];
-uniform vec3 instance_color[MAX_INSTANCES];
+in vec4 p3d_Vertex;
 
 out vec3 fragColor;
-out vec3 fragPos;  // <-- Add this output
+out vec3 fragPos;
+out float fade;
 
 void main() {
-    int instanceID = gl_InstanceID;
-    vec3 pos = in_position + instance_offset[instanceID];
-    fragPos = pos;  // Pass the computed position to the fragment shader
-    fragColor = instance_color[instanceID];
+    vec4 placement = texelFetch(instance_data, gl_InstanceID * 2);
+    vec4 look = texelFetch(instance_data, gl_InstanceID * 2 + 1);
+
+    // Bend the base mesh (a unit sphere) into the entity's model type.
+    vec3 v = p3d_Vertex.xyz;
+    int model_type = int(placement.w + 0.5);
+    if (model_type == 0) {
+        v = v / max(max(abs(v.x), abs(v.y)), max(abs(v.z), 1e-4)) * 0.5;
+    } else if (model_type == 2) {
+        v.xz *= clamp(0.5 - v.y, 0.0, 1.0);
+    } else if (model_type == 3) {
+        v.xz = normalize(v.xz + vec2(1e-4)) * 0.5;
+    }
 
-    // For now, we just output the same for all shapes.
-    gl_Position = vec4(pos, 1.0);
+    vec3 pos = placement.xyz + v * look.w;
+    fragPos = pos;
+    fragColor = look.rgb;
+    fade = 1.0 - smoothstep(0.8 * hologram_radius, hologram_radius, distance(pos, player_position));
+    gl_Position = p3d_ModelViewProjectionMatrix * vec4(pos, 1.0);
 }
-
 """,
 # Fragment shader
-fragment_shader = """
-#version 430
-#define MAX_INSTANCES 10000
+fragment="""
+#version 330 core
 
 in vec3 fragColor;
 in vec3 fragPos;
+in float fade;
 
 out vec4 color;
 
@@ -320,8 +334,7 @@ void main() {
     float scanline = sin(fragPos.y * 20.0 + time * 5.0) * 0.1 + 0.9;
     // Create a pulsing glow effect.
     float glow = 0.5 + 0.5 * sin(time * 2.0);
-    color = vec4(fragColor * scanline * glow, 0.5); // Semi-transparent output.
+    color = vec4(fragColor * scanline * glow, 0.5 * fade); // Semi-transparent output.
 }
-
 """
 )
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Struct-of-arrays storage for entity state with a hot/cold field split.
+
+Each field of a structured dtype gets its own contiguous array, so a vectorized pass over
+`store['x']` reads packed float32 values instead of striding over whole records. Fields read
+every tick ("hot") are kept apart from rarely touched ones ("cold") so they can be listed,
+copied and snapshotted separately.
+"""
+
+import numpy as np
+
+
+class ColumnStore:
+    """
+    Column-per-field table that mimics the field access of a structured array.
+
+    store['x']            -> contiguous column (a view, writes go through)
+    store['x'] = values   -> assign the whole column
+    store[indices]        -> gather rows into a new structured array
+    store[indices] = rows -> scatter a structured array (or another store) into rows
+    """
+
+    def __init__(self, dtype, length=0, hot_fields=(), columns=None):
+        """
+        Parameters:
+            dtype (np.dtype): Structured dtype describing the fields.
+            length (int): Number of rows to allocate (ignored when `columns` is given).
+            hot_fields (iterable): Field names accessed every tick; everything else is cold.
+            columns (dict, optional): Existing column arrays to wrap instead of allocating.
+        """
+        self.dtype = np.dtype(dtype)
+        self.hot_fields = tuple(name for name in self.dtype.names if name in set(hot_fields))
+        self.cold_fields = tuple(name for name in self.dtype.names if name not in self.hot_fields)
+        if columns is None:
+            columns = {}
+            for name in self.dtype.names:
+                field = self.dtype.fields[name][0]
+                columns[name] = np.zeros((length,) + field.shape, dtype=field.base)
+        self.columns = columns
+
+    @property
+    def hot(self):
+        return {name: self.columns[name] for name in self.hot_fields}
+
+    @property
+    def cold(self):
+        return {name: self.columns[name] for name in self.cold_fields}
+
+    @property
+    def names(self):
+        return self.dtype.names
+
+    def __len__(self):
+        return len(self.columns[self.dtype.names[0]])
+
+    def _wrap(self, columns):
+        return ColumnStore(self.dtype, hot_fields=self.hot_fields, columns=columns)
+
+    def head(self, n):
+        """Store viewing the first n rows; columns are views, not copies."""
+        return self.slice(0, n)
+
+    def slice(self, start, stop):
+        """Store viewing rows [start, stop); columns are views, not copies."""
+        return self._wrap({name: col[start:stop] for name, col in self.columns.items()})
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        rows = np.arange(len(self))[key]
+        out = np.empty(np.shape(rows), dtype=self.dtype)
+        for name, col in self.columns.items():
+            out[name] = col[rows]
+        return out
+
+    def __setitem__(self, key, value):
+        if isinstance(key, str):
+            self.columns[key][...] = value
+            return
+        for name, col in self.columns.items():
+            col[key] = value[name]
+
+    def __iter__(self):
+        return iter(self.to_structured())
+
+    def copy(self):
+        return self._wrap({name: col.copy() for name, col in self.columns.items()})
+
+    def resized(self, length):
+        """
+        Returns a new store with `length` rows, holding a copy of the overlapping leading rows.
+        """
+        out = ColumnStore(self.dtype, length, self.hot_fields)
+        n = min(length, len(self))
+        for name, col in self.columns.items():
+            out.columns[name][:n] = col[:n]
+        return out
+
+    def to_structured(self):
+        """Packs all rows into a structured array (for interop and debugging, not hot paths)."""
+        return self[np.arange(len(self))]
+
+    @classmethod
+    def from_structured(cls, array, hot_fields=()):
+        store = cls(array.dtype, len(array), hot_fields)
+        for name in array.dtype.names:
+            store.columns[name][...] = array[name]
+        return store
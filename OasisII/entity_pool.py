@@ -0,0 +1,134 @@
+"""
+Capacity-based entity storage with free-list slot reuse.
+
+Rows live in a preallocated column store that grows geometrically, so births and
+deaths touch only the rows that change instead of reallocating the whole population.
+"""
+
+import numpy as np
+from column_store import ColumnStore
+
+
+class EntityPool:
+    """
+    Pool of entity rows addressed by stable slot indices, stored column-per-field.
+
+    Slots [0, size) have been handed out at least once; `alive` says which of them are
+    currently in use. Dead slots go on a free list and are reused by later spawns before
+    the pool extends `size`. Slot indices stay valid until the slot is killed.
+    """
+
+    def __init__(self, dtype, capacity=1024, growth=2.0, hot_fields=()):
+        """
+        Parameters:
+            dtype (np.dtype): Structured dtype of a row.
+            capacity (int): Initial number of preallocated rows.
+            growth (float): Capacity multiplier applied when the pool runs out of rows.
+            hot_fields (iterable): Fields read every tick; see ColumnStore.
+        """
+        self.dtype = np.dtype(dtype)
+        self.growth = float(growth)
+        capacity = max(int(capacity), 1)
+        self.data = ColumnStore(self.dtype, capacity, hot_fields)
+        self.growable = True  # When False (e.g. columns in shared memory), spawns past capacity are dropped
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._generations = np.zeros(capacity, dtype=np.uint32)  # Spawns into each slot so far
+        self._free = np.empty(capacity, dtype=np.int64)  # Stack of reusable dead slots
+        self._free_count = 0
+        self.size = 0  # High-water mark of handed-out slots
+        self.count = 0  # Live rows
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    @property
+    def rows(self):
+        """Column store viewing all handed-out rows, dead ones included; index it with `alive`."""
+        return self.data.head(self.size)
+
+    @property
+    def alive(self):
+        """Boolean view marking which rows in `rows` are live."""
+        return self._alive[:self.size]
+
+    @property
+    def generations(self):
+        """
+        Per-slot spawn counts for `rows`; a slot's entity is identified by (slot, generation),
+        since the slot is reused once its entity dies.
+        """
+        return self._generations[:self.size]
+
+    def reserve(self, capacity):
+        """
+        Grows the backing arrays to hold at least `capacity` rows.
+        """
+        if capacity <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < capacity:
+            new_capacity = max(int(new_capacity * self.growth), new_capacity + 1)
+
+        data = self.data.resized(new_capacity)
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self.size] = self._alive[:self.size]
+        free = np.empty(new_capacity, dtype=np.int64)
+        free[:self._free_count] = self._free[:self._free_count]
+        generations = np.zeros(new_capacity, dtype=np.uint32)
+        generations[:self.size] = self._generations[:self.size]
+        self.data, self._alive, self._free, self._generations = data, alive, free, generations
+
+    def spawn(self, rows):
+        """
+        Inserts rows, reusing dead slots first. A pool that cannot grow inserts only as
+        many rows as fit.
+
+        Parameters:
+            rows (np.ndarray or ColumnStore): Rows with this pool's fields.
+
+        Returns:
+            np.ndarray: Slot index of each inserted row.
+        """
+        n = len(rows)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+
+        reused = min(n, self._free_count)
+        fresh = n - reused
+        if self.growable:
+            self.reserve(self.size + fresh)
+        elif self.size + fresh > self.capacity:
+            fresh = self.capacity - self.size
+            n = reused + fresh
+            rows = rows[:n]
+
+        slots = np.empty(n, dtype=np.int64)
+        slots[:reused] = self._free[self._free_count - reused:self._free_count]
+        self._free_count -= reused
+        slots[reused:] = np.arange(self.size, self.size + fresh)
+        self.size += fresh
+
+        self.data[slots] = rows
+        self._alive[slots] = True
+        self._generations[slots] += 1
+        self.count += n
+        return slots
+
+    def kill(self, slots):
+        """
+        Marks slots dead and queues them for reuse. Already-dead slots are ignored.
+        """
+        slots = np.unique(np.asarray(slots, dtype=np.int64))
+        slots = slots[self._alive[slots]]
+        if len(slots) == 0:
+            return slots
+        self._alive[slots] = False
+        self._free[self._free_count:self._free_count + len(slots)] = slots
+        self._free_count += len(slots)
+        self.count -= len(slots)
+        return slots
+
+    def live_indices(self):
+        """Slot indices of all live rows."""
+        return np.flatnonzero(self.alive)
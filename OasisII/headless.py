@@ -0,0 +1,144 @@
+"""
+Headless EcoSim runner.
+
+Steps the ecology simulation at a fixed timestep without Ursina/Panda3D, so long
+experiments can run on render-less machines at full CPU speed instead of at frame pacing.
+
+Example:
+    python headless.py --ticks 100000 --dt 0.05 --seed 7 --num-per-species 2000
+"""
+
+import os
+import json
+import time
+import argparse
+import functools
+import numpy as np
+from terrain import analytic_height, height_grid
+from sim_init import generate_species_grid, convert_species_config_with_categorical, EcoSim, summarize_simulation
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "species_config.json")
+
+
+def default_water_level(height_scale=80, world_size=2000):
+    """
+    Places the water surface the way world.Oasis does: 3/4 of height_scale above the lowest terrain point.
+    """
+    heights, _ = height_grid(world_size, height_scale, spacing=4)
+    return float(heights.min()) + height_scale * 3 / 4
+
+
+def build_sim(config_path=DEFAULT_CONFIG, num_per_species=10, seed=None, height_scale=80,
+              spawn_extent=50, water_level=None):
+    """
+    Builds an EcoSim from a species config without touching any rendering code.
+
+    Returns:
+        tuple: (EcoSim instance, categorical mappings)
+    """
+    with open(config_path, "r") as f:
+        config = json.load(f)
+
+    rng = np.random.default_rng(seed)
+    config = generate_species_grid(config, num_per_species=num_per_species, rng=rng, spawn_extent=spawn_extent)
+    species_array, mappings, _ = convert_species_config_with_categorical(config)
+
+    # A partial (unlike a closure) can be pickled to worker processes on platforms without fork.
+    heightmap_func = functools.partial(analytic_height, height_scale=height_scale)
+    sim = EcoSim(heightmap_func, species_array, seed=seed, water_level=water_level)
+    return sim, mappings
+
+
+def run_headless(sim, ticks, dt, report_every=0, recorder=None):
+    """
+    Advances the simulation by a fixed dt for a number of ticks as fast as possible.
+
+    Parameters:
+        sim (EcoSim): The simulation to drive.
+        ticks (int): Number of fixed steps to run.
+        dt (float): Simulation seconds per step.
+        report_every (int): Print progress every N ticks (0 disables progress output).
+        recorder (TrajectoryRecorder, optional): Offered every tick; it keeps the ones on its interval.
+
+    Returns:
+        float: Wall-clock seconds spent stepping.
+    """
+    start = time.perf_counter()
+    for i in range(ticks):
+        sim.step(dt)
+        if recorder is not None:
+            recorder.record(sim)
+        if report_every and (i + 1) % report_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"tick {sim.tick} | sim time {sim.time:.1f}s | {(i + 1) / elapsed:.1f} ticks/s")
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Oasis ecology simulation without rendering.")
+    parser.add_argument("--ticks", type=int, default=1000, help="number of fixed steps to run")
+    parser.add_argument("--dt", type=float, default=1 / 60, help="simulation seconds per step")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for spawning and stepping")
+    parser.add_argument("--num-per-species", type=int, default=10, help="entities generated per species template")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="path to species_config.json")
+    parser.add_argument("--height-scale", type=float, default=80, help="terrain height scale")
+    parser.add_argument("--spawn-extent", type=float, default=50, help="spawn within +/- this distance of the origin")
+    parser.add_argument("--water-level", default=None,
+                        help="water surface height, or 'auto' to place it like world.Oasis (thirst is off if omitted)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="step with this many worker processes over shared memory (0 = single process)")
+    parser.add_argument("--resume", default=None, help="continue from a snapshot instead of the species config")
+    parser.add_argument("--snapshot", default=None, help="write a snapshot here when the run finishes")
+    parser.add_argument("--record", default=None, help="record per-tick trajectories to this file")
+    parser.add_argument("--record-fields", default="x,y,z", help="comma-separated fields to record")
+    parser.add_argument("--record-every", type=int, default=1, help="record every Nth tick")
+    parser.add_argument("--record-frames", type=int, default=1024, help="frames per recording file")
+    parser.add_argument("--record-entities", type=int, default=None,
+                        help="entity slots recorded per frame (default: the pool's capacity)")
+    parser.add_argument("--record-mode", choices=("ring", "segments"), default="ring",
+                        help="overwrite the oldest frames, or roll over to new segment files")
+    parser.add_argument("--report-every", type=int, default=0, help="print progress every N ticks")
+    parser.add_argument("--summary", action="store_true", help="print the full entity summary at the end")
+    args = parser.parse_args(argv)
+
+    water_level = args.water_level
+    if water_level == "auto":
+        water_level = default_water_level(args.height_scale)
+    elif water_level is not None:
+        water_level = float(water_level)
+
+    if args.resume:
+        from snapshot import load_snapshot
+        heightmap_func = functools.partial(analytic_height, height_scale=args.height_scale)
+        sim, mappings, _ = load_snapshot(args.resume, heightmap_func)
+    else:
+        sim, mappings = build_sim(args.config, args.num_per_species, args.seed, args.height_scale,
+                                  args.spawn_extent, water_level)
+    recorder = None
+    if args.record:
+        from recorder import TrajectoryRecorder
+        recorder = TrajectoryRecorder(args.record, sim.pool, fields=args.record_fields.split(","),
+                                      max_entities=args.record_entities, capacity=args.record_frames,
+                                      every=args.record_every, mode=args.record_mode)
+
+    if args.workers:
+        from parallel_sim import ParallelEcoSim
+        with ParallelEcoSim(sim, workers=args.workers) as parallel:
+            elapsed = run_headless(parallel, args.ticks, args.dt, args.report_every, recorder)
+    else:
+        elapsed = run_headless(sim, args.ticks, args.dt, args.report_every, recorder)
+    if recorder is not None:
+        recorder.close()
+
+    print(f"Ran {args.ticks} ticks ({sim.time:.1f} sim seconds, {sim.pool.count}"
+          f"/{len(sim.entities)} entities alive) "
+          f"in {elapsed:.3f}s wall time ({args.ticks / max(elapsed, 1e-9):.1f} ticks/s)")
+    if args.snapshot:
+        from snapshot import save_snapshot
+        save_snapshot(args.snapshot, sim, mappings)
+    if args.summary:
+        summarize_simulation(sim, mappings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+First person controller that stands on a Heightfield instead of ray casting a collision mesh.
+"""
+
+from ursina import time
+from ursina.prefabs.first_person_controller import FirstPersonController
+
+
+class HeightfieldController(FirstPersonController):
+    """
+    FirstPersonController whose gravity, landing and slope handling query `ground`
+    (a terrain.Heightfield) rather than casting rays at the terrain.
+
+    Ray casts for walking into obstacles are left to FirstPersonController; the terrain
+    itself needs no collider.
+    """
+
+    max_step = .5  # Highest rise walked up in one frame
+    min_normal_y = .7  # Steeper ground than this blocks walking, as in FirstPersonController
+
+    def __init__(self, ground=None, **kwargs):
+        super().__init__(**kwargs)
+        self.ground = ground
+
+    def update(self):
+        if self.ground is None:
+            return super().update()
+
+        x, z = self.x, self.z
+        gravity, self.gravity = self.gravity, 0  # Look and move only; the ground is handled below
+        super().update()
+        self.gravity = gravity
+
+        ground = self.ground.height(self.x, self.z)
+        if ground > self.y and (self.x, self.z) != (x, z):
+            if ground - self.y > self.max_step or self.ground.normal(self.x, self.z)[1] < self.min_normal_y:
+                self.x, self.z = x, z  # Too steep to walk up: undo the horizontal move
+                ground = self.ground.height(x, z)
+
+        if not gravity:
+            return
+        if self.y <= ground + .1:
+            if not self.grounded:
+                self.land()
+            self.grounded = True
+            self.y = ground
+            return
+
+        self.grounded = False
+        self.y -= min(self.air_time, self.y - ground) * time.dt * 100
+        self.air_time += time.dt * .25 * gravity
@@ -0,0 +1,83 @@
+"""
+Per-instance data for hardware-instanced drawing, kept in a GPU buffer texture.
+
+Each instance is a fixed number of RGBA32F texels. The CPU side is a float32 NumPy
+array with the same layout, so uploading is a memory copy into the texture's RAM image;
+the vertex shader fetches its texels with texelFetch(buffer, gl_InstanceID * N + k).
+
+Uploads are incremental: only instances whose data differs from what the texture already
+holds are copied, and a frame where nothing changed leaves the texture untouched, so the
+driver transfers nothing. (Panda3D re-sends a modified texture whole, so changed frames
+still cost one full transfer.)
+"""
+
+import numpy as np
+from panda3d.core import Texture, GeomEnums, OmniBoundingVolume
+
+
+class InstanceBuffer:
+    """
+    NumPy-backed buffer texture plus the instance count of the node drawing from it.
+
+    data[i] holds instance i as `texels` RGBA float32 texels (4 * texels floats). Write into
+    `data` (or views of its columns), then call upload(count) once per frame.
+    """
+
+    def __init__(self, capacity, texels=1, name='instance_data'):
+        """
+        Parameters:
+            capacity (int): Maximum number of instances.
+            texels (int): RGBA texels per instance.
+            name (str): Name of the texture (and of the shader input it is bound to).
+        """
+        self.capacity = int(capacity)
+        self.texels = int(texels)
+        self.name = name
+        self.data = np.zeros((self.capacity, 4 * self.texels), dtype=np.float32)
+        self.texture = Texture(name)
+        self.texture.setup_buffer_texture(self.capacity * self.texels, Texture.T_float,
+                                          Texture.F_rgba32, GeomEnums.UH_dynamic)
+        self.texture.make_ram_image()
+        # Read-only view of what the texture holds; reading it does not mark the texture modified
+        self._uploaded = np.frombuffer(self.texture.get_ram_image(), dtype=np.float32).reshape(self.data.shape)
+        self.count = 0
+        self.nodes = []
+
+    def attach(self, node_path):
+        """
+        Binds the buffer to a NodePath and makes it draw one copy of its geometry per instance.
+        Instances are placed by the shader, so the node's own bounds would cull them wrongly.
+        """
+        node_path.set_shader_input(self.name, self.texture)
+        node_path.node().set_bounds(OmniBoundingVolume())
+        node_path.node().set_final(True)
+        node_path.set_instance_count(self.count)
+        if not self.count:
+            node_path.hide()
+        self.nodes.append(node_path)
+
+    def upload(self, count):
+        """
+        Sends the first `count` instances to the GPU, copying only the ones that changed,
+        and draws that many.
+
+        Returns:
+            int: Number of instances copied.
+        """
+        count = min(int(count), self.capacity)
+        shown = self.data[:count]
+        changed = np.flatnonzero((shown != self._uploaded[:count]).any(axis=1))
+        if len(changed):
+            ram = np.frombuffer(self.texture.modify_ram_image(), dtype=np.float32).reshape(self.data.shape)
+            ram[changed] = shown[changed]
+            self._uploaded = ram  # Same memory unless Panda3D had to detach a shared image
+        if count != self.count:
+            self.count = count
+            for node_path in self.nodes:
+                # An instance count of 0 means "not instanced" to Panda3D, which would draw one copy
+                node_path.set_instance_count(count)
+                if count:
+                    node_path.show()
+                else:
+                    node_path.hide()
+        return len(changed)
@@ -0,0 +1,74 @@
+"""
+Builds Panda3D geometry straight from NumPy arrays.
+
+Vertex attributes are written into the GeomVertexData's own memory through the buffer
+protocol, one interleaved row per vertex, and indices into the primitive's index array the
+same way. No Python floats, Vec3s or intermediate lists are created, so build time and peak
+memory scale with the raw array sizes.
+"""
+
+import numpy as np
+from panda3d.core import (
+    Geom, GeomEnums, GeomNode, GeomTriangles, GeomVertexArrayFormat, GeomVertexData,
+    GeomVertexFormat, NodePath,
+)
+
+# (column name, components, contents) in interleaving order
+_COLUMNS = (
+    ('vertex', 3, Geom.C_point),
+    ('normal', 3, Geom.C_normal),
+    ('texcoord', 2, Geom.C_texcoord),
+    ('color', 4, Geom.C_color),
+)
+
+
+def build_geom_node(vertices, triangles, normals=None, uvs=None, colors=None, name='mesh', static=True):
+    """
+    Creates a triangle mesh from NumPy arrays.
+
+    Parameters:
+        vertices (np.ndarray): (n, 3) positions.
+        triangles (np.ndarray): (m, 3) vertex indices, or a flat array of them.
+        normals (np.ndarray, optional): (n, 3) unit normals.
+        uvs (np.ndarray, optional): (n, 2) texture coordinates.
+        colors (np.ndarray, optional): (n, 4) RGBA colors.
+        name (str): Name of the GeomNode.
+        static (bool): Whether the mesh will not be modified after creation.
+
+    Returns:
+        NodePath: A GeomNode usable as an Entity model (Entity(model=...)).
+    """
+    given = {'vertex': vertices, 'normal': normals, 'texcoord': uvs, 'color': colors}
+    array_format = GeomVertexArrayFormat()
+    fields = []
+    for column, components, contents in _COLUMNS:
+        if given[column] is None:
+            continue
+        array_format.add_column(column, components, Geom.NT_float32, contents)
+        fields.append((column, np.float32, (components,)))
+    row = np.dtype(fields)
+    if array_format.get_stride() != row.itemsize:
+        raise ValueError(f"Unexpected vertex stride {array_format.get_stride()} for {row}")
+
+    usage = GeomEnums.UH_static if static else GeomEnums.UH_dynamic
+    vertex_format = GeomVertexFormat.register_format(GeomVertexFormat(array_format))
+    vdata = GeomVertexData(name, vertex_format, usage)
+    n = len(vertices)
+    vdata.unclean_set_num_rows(n)
+    rows = np.frombuffer(memoryview(vdata.modify_array(0)), dtype=row)
+    for column, _, _ in fields:
+        rows[column] = given[column]
+
+    index_type = np.uint16 if n <= 0xffff else np.uint32
+    prim = GeomTriangles(usage)
+    prim.set_index_type(GeomEnums.NT_uint16 if index_type is np.uint16 else GeomEnums.NT_uint32)
+    indices = np.asarray(triangles).reshape(-1)
+    index_array = prim.modify_vertices()
+    index_array.unclean_set_num_rows(len(indices))
+    np.frombuffer(memoryview(index_array), dtype=index_type)[:] = indices
+
+    geom = Geom(vdata)
+    geom.add_primitive(prim)
+    node = GeomNode(name)
+    node.add_geom(geom)
+    return NodePath(node)
@@ -0,0 +1,269 @@
+"""
+Multi-process, domain-decomposed stepping for EcoSim.
+
+The entity columns are moved into shared memory and a pool of worker processes steps
+them in place. Each tick runs three parallel phases:
+
+1. Needs and movement over contiguous slot ranges (no spatial dependency).
+2. Encounters over spatial tiles: the world is cut into vertical strips along x with
+   equal populations. Once per tick the parent sorts the living entities by x into a shared
+   index buffer, so every strip is a contiguous run of it, and so is the strip widened by
+   `halo` units past its edges. A worker owns the grazers and hunters in its run and sees
+   the plants and prey in the widened run, so encounters across a boundary are found
+   without exchanging data, and its work is proportional to its strip, not the population.
+   Entities that crossed a strip edge simply belong to the new strip next tick, since
+   ownership is recomputed from positions every tick.
+3. Deaths and birth rolls over slot ranges.
+
+Between phases the parent resolves contested kills (a prey in a halo can be caught from
+two strips) and applies births and deaths, which only touch the rows that change.
+"""
+
+import os
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from column_store import ColumnStore
+from spatial_grid import SpatialGrid
+from sim_init import (
+    ANIMAL_TYPES, PLANT_TYPES, TYPE_CODES, GRAZE_RADIUS, PREDATION_RADIUS,
+    decay_needs, wander, grazer_mask, hunter_mask, find_grazing, apply_grazing,
+    find_catches, pick_kills, apply_kills, starved_mask, roll_births,
+)
+
+# Worker-process state, set by _attach.
+_STORE = None
+_ALIVE = None
+_ORDER = None  # Living entity indices sorted by x, written by the parent every tick
+_GRIDS = {}  # Radius -> SpatialGrid, kept between ticks so their cell tables are reused
+_SHM = []
+_HEIGHTMAP = None
+_WATER_LEVEL = None
+
+
+def _attach(layout, dtype, hot_fields, heightmap_func, water_level):
+    global _STORE, _ALIVE, _ORDER, _HEIGHTMAP, _WATER_LEVEL
+    columns = {}
+    for name, (shm_name, shape, dtype_str) in layout.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SHM.append(shm)  # Keep the mapping open for the life of the worker
+        columns[name] = np.ndarray(shape, dtype=np.dtype(dtype_str), buffer=shm.buf)
+    _ALIVE = columns.pop('__alive__')
+    _ORDER = columns.pop('__order__')
+    _STORE = ColumnStore(dtype, hot_fields=hot_fields, columns=columns)
+    _HEIGHTMAP = heightmap_func
+    _WATER_LEVEL = water_level
+
+
+def _phase_move(task):
+    start, stop, dt, seed = task
+    e = _STORE.slice(start, stop)
+    alive = _ALIVE[start:stop]
+    is_animal = alive & np.isin(e['type'], ANIMAL_TYPES)
+    is_plant = alive & np.isin(e['type'], PLANT_TYPES)
+    decay_needs(e, is_animal, is_plant, dt, _WATER_LEVEL)
+    wander(e, is_animal, dt, np.random.default_rng(seed))
+    e['y'] = _HEIGHTMAP(e['x'], e['z'])
+
+
+def _grid(radius, indices):
+    """This worker's grid of `radius`, indexing only the entities `indices` (grid index i is indices[i])."""
+    grid = _GRIDS.get(radius)
+    if grid is None:
+        grid = _GRIDS[radius] = SpatialGrid(radius)
+    grid.rebuild(_STORE['x'][indices], _STORE['z'][indices])
+    return grid
+
+
+def _phase_encounters(task):
+    own_start, own_stop, near_start, near_stop, dt, seed = task
+    e = _STORE
+    own = _ORDER[own_start:own_stop]
+    near = _ORDER[near_start:near_stop]
+    rng = np.random.default_rng(seed)
+    empty = np.empty(0, dtype=np.int64)
+    own_fields = {name: e[name][own] for name in ('type', 'hunger')}
+    near_type = e['type'][near]
+
+    grazers = own[grazer_mask(own_fields, True)]
+    grazing = (empty, empty)
+    if len(grazers):
+        plants = near[np.isin(near_type, PLANT_TYPES)]
+        grazers, plant = find_grazing(e, grazers, _grid(GRAZE_RADIUS, plants))
+        grazing = (grazers, plants[plant])
+
+    hunters = own[hunter_mask(own_fields, True)]
+    catches = (empty, empty)
+    if len(hunters):
+        prey = near[near_type == TYPE_CODES['Prey']]
+        pred, caught = find_catches(e, hunters, _grid(PREDATION_RADIUS, prey), dt, rng)
+        catches = (pred, prey[caught])
+
+    return grazing, catches
+
+
+def _phase_fate(task):
+    start, stop, dt, seed = task
+    e = _STORE.slice(start, stop)
+    alive = _ALIVE[start:stop]
+    dead = starved_mask(e, alive, _WATER_LEVEL)
+    parents = roll_births(e, alive & ~dead, dt, np.random.default_rng(seed))
+    return np.flatnonzero(dead) + start, parents + start
+
+
+class ParallelEcoSim:
+    """
+    Steps an EcoSim with a pool of worker processes over shared memory.
+
+    The wrapped sim stays the source of truth (entities, alive, spawn/kill, neighbor
+    queries all keep working), but its pool can no longer grow: births beyond the
+    capacity reserved here are dropped. Call close() to move the columns back into
+    private memory and stop the workers.
+    """
+
+    def __init__(self, sim, workers=None, capacity=None, halo=None, tiles=None):
+        """
+        Parameters:
+            sim (EcoSim): Simulation to drive. Its heightmap_func must be picklable when the
+                platform cannot fork (e.g. a module-level function or functools.partial).
+            workers (int, optional): Worker processes; defaults to the CPU count.
+            capacity (int, optional): Fixed entity capacity; defaults to 4x the current population.
+            halo (float, optional): Overlap past each strip edge; defaults to the largest interaction radius.
+            tiles (int, optional): Number of spatial strips; defaults to the worker count.
+        """
+        self.sim = sim
+        self.workers = workers or os.cpu_count() or 1
+        self.tiles = tiles or self.workers
+        self.halo = halo if halo is not None else max(GRAZE_RADIUS, PREDATION_RADIUS)
+
+        pool = sim.pool
+        pool.reserve(capacity or max(4 * pool.count, pool.capacity))
+        self._shm = []
+        layout = {}
+        order = np.zeros(pool.capacity, dtype=np.int64)
+        for name, col in list(pool.data.columns.items()) + [('__alive__', pool._alive), ('__order__', order)]:
+            shm = shared_memory.SharedMemory(create=True, size=max(col.nbytes, 1))
+            shared = np.ndarray(col.shape, dtype=col.dtype, buffer=shm.buf)
+            shared[...] = col
+            self._shm.append(shm)
+            layout[name] = (shm.name, col.shape, col.dtype.str)
+            if name == '__alive__':
+                pool._alive = shared
+            elif name == '__order__':
+                self._order = shared
+            else:
+                pool.data.columns[name] = shared
+        pool.growable = False
+
+        method = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+        self._workers = mp.get_context(method).Pool(
+            self.workers,
+            initializer=_attach,
+            initargs=(layout, pool.dtype, pool.data.hot_fields, sim.heightmap_func, sim.water_level),
+        )
+
+    @property
+    def entities(self):
+        return self.sim.entities
+
+    @property
+    def alive(self):
+        return self.sim.alive
+
+    @property
+    def pool(self):
+        return self.sim.pool
+
+    @property
+    def time(self):
+        return self.sim.time
+
+    @property
+    def tick(self):
+        return self.sim.tick
+
+    def _slot_ranges(self, dt, rng):
+        size = self.sim.pool.size
+        edges = np.linspace(0, size, self.workers + 1).astype(np.int64)
+        seeds = rng.integers(0, 2 ** 63, self.workers)
+        return [(int(edges[i]), int(edges[i + 1]), dt, int(seeds[i])) for i in range(self.workers)]
+
+    def _strips(self, dt, rng):
+        """
+        Sorts the living entities by x into the shared order buffer and cuts it into strips of
+        equal population. Each task gets its strip's run of the buffer and the run of the
+        strip widened by the halo.
+        """
+        living = np.flatnonzero(self.sim.alive)
+        x = self.sim.entities['x'][living]
+        by_x = np.argsort(x, kind='stable')
+        sorted_x = x[by_x]
+        self._order[:len(living)] = living[by_x]
+
+        cuts = np.linspace(0, len(living), self.tiles + 1).astype(np.int64)
+        bounds = sorted_x[np.minimum(cuts[1:-1], len(living) - 1)] if len(living) else np.zeros(self.tiles - 1)
+        lo = np.concatenate(([-np.inf], bounds))
+        hi = np.concatenate((bounds, [np.inf]))
+        near_starts = np.searchsorted(sorted_x, lo - self.halo, side='left')
+        near_stops = np.searchsorted(sorted_x, hi + self.halo, side='right')
+        seeds = rng.integers(0, 2 ** 63, self.tiles)
+        return [(int(cuts[i]), int(cuts[i + 1]), int(near_starts[i]), int(near_stops[i]), dt, int(seeds[i]))
+                for i in range(self.tiles)]
+
+    def step(self, dt):
+        """
+        Advances the simulation by 'dt', matching EcoSim.step stage for stage.
+        """
+        sim = self.sim
+        rng = sim.rng
+
+        self._workers.map(_phase_move, self._slot_ranges(dt, rng))
+
+        results = self._workers.map(_phase_encounters, self._strips(dt, rng))
+
+        e = sim.entities
+        grazers = np.concatenate([g for (g, _), _ in results])
+        plants = np.concatenate([p for (_, p), _ in results])
+        if len(grazers):
+            apply_grazing(e, grazers, plants, dt)
+        pred = np.concatenate([c[0] for _, c in results])
+        prey = np.concatenate([c[1] for _, c in results])
+        if len(pred):
+            pred, prey = pick_kills(pred, prey, rng)
+            apply_kills(e, pred, prey)
+            sim.pool.kill(prey)
+
+        fates = self._workers.map(_phase_fate, self._slot_ranges(dt, rng))
+        sim.pool.kill(np.concatenate([dead for dead, _ in fates]))
+        parents = np.concatenate([p for _, p in fates])
+        parents = parents[sim.alive[parents]]
+        if len(parents):
+            sim.spawn_offspring(parents)
+
+        sim.time += dt
+        sim.tick += 1
+
+    def close(self):
+        """
+        Stops the workers and copies the columns back into private, growable memory.
+        """
+        if self._workers is None:
+            return
+        self._workers.close()
+        self._workers.join()
+        self._workers = None
+
+        pool = self.sim.pool
+        pool.data = pool.data.copy()
+        pool._alive = pool._alive.copy()
+        pool.growable = True
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
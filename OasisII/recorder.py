@@ -0,0 +1,310 @@
+"""
+Append-only trajectory recording of EcoSim state into memory-mapped files.
+
+File layout (little endian):
+    8 bytes   magic b'OASISREC'
+    uint32    format version
+    uint32    header length in bytes
+    int64     frames written so far (updated after every frame, so readers can tail a live file)
+    int64     tick of the first recorded frame
+    header    UTF-8 JSON: recorded fields, entity capacity, frame capacity, recording interval
+    frames    fixed-size frame records, starting on a 64-byte boundary
+
+Every frame holds tick, sim time, the number of slots recorded, the number of slots the pool
+had in use, the alive mask, the generation of every slot and one array per recorded field,
+indexed by pool slot. Slots are reused after a death; the generation (the pool's spawn count
+for the slot) tells the entities that held a slot apart. Frames sit in a ring of `capacity`
+slots; in 'segments' mode the recorder instead rolls over to a new file when a segment
+fills up, keeping the whole history.
+"""
+
+import os
+import json
+import struct
+import warnings
+import numpy as np
+
+MAGIC = b'OASISREC'
+VERSION = 1
+_PREAMBLE = struct.Struct('<8sII')
+_COUNTERS_OFFSET = _PREAMBLE.size
+_COUNTERS = 2  # frames written, first tick
+_ALIGN = 64
+
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _frame_dtype(field_specs, max_entities):
+    fields = [('tick', '<i8'), ('time', '<f8'), ('count', '<i4'), ('pool_size', '<i8'),
+              ('generation', '<u4', (max_entities,)), ('alive', '?', (max_entities,))]
+    for name, (dtype, shape) in field_specs.items():
+        fields.append((name, dtype, (max_entities,) + tuple(shape)))
+    return np.dtype(fields, align=True)
+
+
+def segment_path(path, index):
+    """Path of segment `index` for a recording started at `path` (segment 0 is `path` itself)."""
+    if index == 0:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{index:04d}{ext}"
+
+
+class TrajectoryRecorder:
+    """
+    Writes selected EcoSim fields to a preallocated memory-mapped file each Nth tick.
+    """
+
+    def __init__(self, path, pool, fields=('x', 'y', 'z'), max_entities=None, capacity=1024,
+                 every=1, mode='ring'):
+        """
+        Parameters:
+            path (str): Output file (first segment in 'segments' mode).
+            pool (EntityPool): Pool of the simulation to record, e.g. sim.pool; field dtypes
+                are read from its columns.
+            fields (iterable): Fields to record. The alive mask is always recorded.
+            max_entities (int, optional): Slots recorded per frame; defaults to the pool's
+                current capacity. If the pool later grows past it, the slots beyond are left out
+                with a warning; each frame's pool_size shows how many there were.
+            capacity (int): Frames per file.
+            every (int): Record only ticks divisible by this.
+            mode (str): 'ring' overwrites the oldest frames, 'segments' starts a new file when full.
+        """
+        if mode not in ('ring', 'segments'):
+            raise ValueError(f"Unknown recording mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.every = max(int(every), 1)
+        self.capacity = int(capacity)
+        self.max_entities = int(max_entities) if max_entities is not None else pool.capacity
+        self.overflowed = False
+        self.field_specs = {}
+        for name in fields:
+            col = pool.data[name]
+            self.field_specs[name] = (col.dtype.str, col.shape[1:])
+        self.frame_dtype = _frame_dtype(self.field_specs, self.max_entities)
+        self.segment = 0
+        self.frames_written = 0  # Across all segments
+        self.frames = self.counters = None
+        self._open(segment_path(path, 0))
+
+    def _open(self, path):
+        header = json.dumps({
+            'fields': {name: [dtype, list(shape)] for name, (dtype, shape) in self.field_specs.items()},
+            'max_entities': self.max_entities,
+            'capacity': self.capacity,
+            'every': self.every,
+            'mode': self.mode,
+            'segment': self.segment,
+        }).encode('utf-8')
+        data_start = _align(_COUNTERS_OFFSET + 8 * _COUNTERS + len(header))
+        with open(path, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(np.zeros(_COUNTERS, dtype='<i8').tobytes())
+            f.write(header)
+            f.truncate(data_start + self.capacity * self.frame_dtype.itemsize)
+        self.counters = np.memmap(path, dtype='<i8', mode='r+', offset=_COUNTERS_OFFSET, shape=(_COUNTERS,))
+        self.frames = np.memmap(path, dtype=self.frame_dtype, mode='r+', offset=data_start, shape=(self.capacity,))
+        self.segment_frames = 0
+
+    def record(self, sim):
+        """
+        Appends the current state of `sim` if its tick falls on the recording interval.
+
+        Returns:
+            bool: Whether a frame was written.
+        """
+        if sim.tick % self.every:
+            return False
+        if self.mode == 'segments' and self.segment_frames == self.capacity:
+            self.close()
+            self.segment += 1
+            self._open(segment_path(self.path, self.segment))
+
+        slot = self.segment_frames % self.capacity
+        size = sim.pool.size
+        n = min(size, self.max_entities)
+        if size > self.max_entities and not self.overflowed:
+            self.overflowed = True
+            warnings.warn(f"{self.path}: the pool has {size} slots in use but only {self.max_entities} "
+                          f"are recorded; raise max_entities to record all of them", RuntimeWarning)
+        frames = self.frames
+        frames['tick'][slot] = sim.tick
+        frames['time'][slot] = sim.time
+        frames['count'][slot] = n
+        frames['pool_size'][slot] = size
+        frames['alive'][slot, :n] = sim.alive[:n]
+        frames['alive'][slot, n:] = False
+        frames['generation'][slot, :n] = sim.pool.generations[:n]
+        frames['generation'][slot, n:] = 0
+        entities = sim.entities
+        for name in self.field_specs:
+            frames[name][slot, :n] = entities[name][:n]
+
+        if self.segment_frames == 0:
+            self.counters[1] = sim.tick
+        self.segment_frames += 1
+        self.frames_written += 1
+        self.counters[0] = self.segment_frames  # Publish only once the frame is complete
+        return True
+
+    def flush(self):
+        if self.frames is None:
+            return
+        self.frames.flush()
+        self.counters.flush()
+
+    def close(self):
+        """Flushes and unmaps the current file. Closing again does nothing."""
+        if self.frames is None:
+            return
+        self.flush()
+        self.frames = self.counters = None
+
+
+class TrajectoryReader:
+    """
+    Read-only, zero-copy access to a recording file (one segment).
+
+    frame(i) and field(name) return views into the memory map; nothing is parsed or
+    copied until the caller indexes into it.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an Oasis trajectory recording")
+            if version > VERSION:
+                raise ValueError(f"{path} uses recording format {version}; this build reads up to {VERSION}")
+            f.seek(_COUNTERS_OFFSET + 8 * _COUNTERS)
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        self.path = path
+        self.header = header
+        self.max_entities = header['max_entities']
+        self.capacity = header['capacity']
+        self.every = header['every']
+        self.fields = tuple(header['fields'])
+        field_specs = {name: (dtype, tuple(shape)) for name, (dtype, shape) in header['fields'].items()}
+        self.frame_dtype = _frame_dtype(field_specs, self.max_entities)
+        data_start = _align(_COUNTERS_OFFSET + 8 * _COUNTERS + header_len)
+        self.counters = np.memmap(path, dtype='<i8', mode='r', offset=_COUNTERS_OFFSET, shape=(_COUNTERS,))
+        self.frames = np.memmap(path, dtype=self.frame_dtype, mode='r', offset=data_start, shape=(self.capacity,))
+
+    @property
+    def frames_written(self):
+        return int(self.counters[0])
+
+    @property
+    def first_tick(self):
+        """Tick of the oldest frame still held in the file."""
+        return int(self.counters[1]) + self.oldest * self.every
+
+    @property
+    def oldest(self):
+        """Sequence number of the oldest frame still held (earlier ones were overwritten)."""
+        return max(0, self.frames_written - self.capacity)
+
+    def __len__(self):
+        return min(self.frames_written, self.capacity)
+
+    def _slot(self, i):
+        """Ring slot of the i-th held frame (0 = oldest)."""
+        if not 0 <= i < len(self):
+            raise IndexError(f"frame {i} out of range (0..{len(self) - 1})")
+        return (self.oldest + i) % self.capacity
+
+    def frame(self, i):
+        """The i-th held frame, oldest first, as a zero-copy record."""
+        return self.frames[self._slot(i)]
+
+    def index_of_tick(self, tick):
+        """
+        O(1) lookup of the held frame index for a recorded tick, or None if it is not held.
+        """
+        offset, rem = divmod(tick - int(self.counters[1]), self.every)
+        i = offset - self.oldest
+        if rem or not 0 <= i < len(self):
+            return None
+        return i
+
+    def field(self, name):
+        """
+        History of one field as (frames, max_entities, ...) in chronological order. Zero-copy
+        unless the ring has wrapped, in which case the two halves are joined into a copy.
+        """
+        data = self.frames[name]
+        n = len(self)
+        start = self.oldest % self.capacity
+        if start == 0:
+            return data[:n]
+        return np.concatenate((data[start:], data[:start]))
+
+
+class TrajectoryPlayer:
+    """
+    Plays a recording back at any speed, forward or backward, by simulated time.
+
+    Frames are recorded at a fixed tick interval, so the frame for a playback time is found
+    arithmetically (O(1)) rather than by scanning. Works on a file that is still being written.
+    """
+
+    def __init__(self, reader, loop=False):
+        self.reader = reader
+        self.loop = loop
+        self.direction = 1
+        self.position = self.start_time  # Playback position in simulated seconds
+
+    @property
+    def start_time(self):
+        return float(self.reader.frame(0)['time']) if len(self.reader) else 0.0
+
+    @property
+    def end_time(self):
+        return float(self.reader.frame(len(self.reader) - 1)['time']) if len(self.reader) else 0.0
+
+    @property
+    def frame_interval(self):
+        """Simulated seconds between consecutive frames."""
+        n = len(self.reader)
+        return (self.end_time - self.start_time) / (n - 1) if n > 1 else 1.0
+
+    def index(self):
+        """Index of the held frame closest to the playback position."""
+        i = int(round((self.position - self.start_time) / self.frame_interval))
+        return min(max(i, 0), len(self.reader) - 1)
+
+    def advance(self, dt, speed=1.0):
+        """
+        Moves the playback position by dt * speed simulated seconds in the current direction.
+
+        Returns:
+            np.void: The frame to show, or None if nothing has been recorded yet.
+        """
+        if len(self.reader) == 0:
+            return None
+        start, end = self.start_time, self.end_time
+        self.position += dt * speed * self.direction
+        if self.loop and end > start:
+            self.position = start + (self.position - start) % (end - start)
+        else:
+            self.position = min(max(self.position, start), end)
+        return self.reader.frame(self.index())
+
+    def reverse(self):
+        self.direction = -self.direction
+
+    def seek_time(self, sim_time):
+        self.position = min(max(float(sim_time), self.start_time), self.end_time)
+
+    def seek_tick(self, tick):
+        """
+        Jumps to a recorded tick. Returns False if that tick is not held in the recording.
+        """
+        i = self.reader.index_of_tick(tick)
+        if i is None:
+            return False
+        self.position = float(self.reader.frame(i)['time'])
+        return True
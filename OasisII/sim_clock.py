@@ -0,0 +1,95 @@
+"""
+Fixed-step simulation clock.
+
+The game loop calls advance(time.dt) once per frame. Wall time, scaled by time_scale, piles
+up in an accumulator that is paid out in whole steps of `step` simulation seconds, so the
+simulation always sees the same dt no matter the frame rate or time scale. At most
+`max_steps` are paid out per frame; a backlog of up to `max_backlog` seconds is carried over
+to catch up after a hitch, and anything beyond is dropped, so frame cost stays bounded even
+when the requested time scale outruns the CPU. The clock then runs slower than requested:
+at most max_steps * step simulation seconds per frame (8x real time at 60 fps with the
+defaults). effective_scale is the rate actually delivered, for display.
+
+Rendering blends the state before the last step with the state after it by `alpha`, the
+fraction of a step accumulated since, which keeps motion smooth when steps and frames
+do not line up.
+
+Example:
+    for _ in range(clock.advance(time.dt)):
+        sim.step(clock.step)
+"""
+
+
+class SimClock:
+    """
+    Turns wall time into a whole number of fixed simulation steps per frame.
+    """
+
+    def __init__(self, step=1 / 60, time_scale=1.0, max_steps=8, max_backlog=None, start_time=0.0):
+        """
+        Parameters:
+            step (float): Simulation seconds per step.
+            time_scale (float): Simulation seconds per wall second.
+            max_steps (int): Steps paid out per frame at most.
+            max_backlog (float, optional): Simulation seconds kept owed after a frame; the rest is
+                dropped. Defaults to one frame's budget (max_steps * step).
+            start_time (float): Simulation time to start at.
+        """
+        self.step = step
+        self.time_scale = time_scale
+        self.max_steps = max_steps
+        self.max_backlog = max_steps * step if max_backlog is None else max_backlog
+        self.time = start_time  # Simulation time once the steps of the last advance() have run
+        self.tick = 0
+        self.steps = 0  # Steps paid out by the last advance()
+        self.accumulator = 0.0
+        self.dropped = 0.0  # Simulation seconds skipped because the step budget was exceeded
+        self.effective_scale = time_scale  # Simulation seconds run per wall second, smoothed over ~.25 s
+
+    def advance(self, dt):
+        """
+        Adds `dt` wall seconds and returns the number of steps to run this frame.
+        """
+        self.accumulator += max(dt, 0.0) * self.time_scale
+        steps = min(int(self.accumulator / self.step + 1e-9), self.max_steps)
+        self.accumulator = max(self.accumulator - steps * self.step, 0.0)
+        if self.accumulator > self.max_backlog:
+            self.dropped += self.accumulator - self.max_backlog
+            self.accumulator = self.max_backlog
+        self.steps = steps
+        self.tick += steps
+        self.time += steps * self.step
+        if dt > 0:
+            self.effective_scale += (steps * self.step / dt - self.effective_scale) * min(dt * 4, 1.0)
+        return steps
+
+    def skip(self, seconds):
+        """
+        Moves simulation time ahead by `seconds` simulated outside the fixed steps (e.g. by a
+        fast-forward), discarding any backlog.
+        """
+        self.time += seconds
+        self.accumulator = 0.0
+        self.steps = 0
+
+    @property
+    def limited(self):
+        """Whether the step budget is holding the clock noticeably below time_scale."""
+        return self.effective_scale < 0.9 * self.time_scale
+
+    def scale_label(self):
+        """HUD text for the time scale, with the rate actually delivered when it falls short."""
+        label = f'Time Scale: {self.time_scale:.1f}'
+        if self.limited:
+            label += f' (running {self.effective_scale:.1f}x, step budget)'
+        return label
+
+    @property
+    def alpha(self):
+        """How far, in steps (0 to 1), render time is past the state before the last step."""
+        return min(self.accumulator / self.step, 1.0)
+
+    @property
+    def render_time(self):
+        """Simulation time matching state blended by `alpha`: one step behind, plus alpha."""
+        return self.time - (1.0 - self.alpha) * self.step
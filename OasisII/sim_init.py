@@ -1,11 +1,63 @@
 import json
 import numpy as np
-
-def generate_species_grid(json_data, num_per_species=10):
+from spatial_grid import SpatialGrid
+from entity_pool import EntityPool
+
+# Behavioural role of a species ("type" in species_config.json). Fixed codes, since the
+# step kernel branches on them.
+TYPE_CODES = {'Tree': 0, 'Food Source': 1, 'Prey': 2, 'Predator': 3}
+PLANT_TYPES = (TYPE_CODES['Tree'], TYPE_CODES['Food Source'])
+ANIMAL_TYPES = (TYPE_CODES['Prey'], TYPE_CODES['Predator'])
+
+# Fields read or written by every EcoSim.step; they get their own contiguous columns, and
+# the remaining (cold) fields are kept out of the way of the vectorized passes.
+HOT_FIELDS = ('type', 'species', 'asleep', 'x', 'y', 'z', 'vx', 'vz',
+              'hunger', 'water', 'sleep', 'energy', 'aggression')
+
+# Needs (per simulated second). Hunger rises toward 1 (starving); water and sleep fall toward 0.
+HUNGER_RATE = 1 / 1800
+THIRST_RATE = 1 / 1200
+FATIGUE_RATE = 1 / 3600
+SLEEP_RECOVERY_RATE = 1 / 600
+SLEEP_THRESHOLD = 0.15  # Awake animals fall asleep at or below this sleep level
+WAKE_THRESHOLD = 0.9  # ...and wake once recovered to this level
+BASE_ENERGY_DRAIN = 1 / 600
+STARVING_ENERGY_DRAIN = 1 / 300  # Extra drain scaled by hunger
+PLANT_ENERGY_GAIN = 1 / 300
+MAX_ENERGY = 10.0
+DRINK_RATE = 1 / 30
+DRINK_MARGIN = 1.0  # Height above the water level that still counts as the shore
+
+# Encounters
+PREDATION_RADIUS = 2.0
+HUNT_HUNGER = 0.5  # Predators only hunt when at least this hungry
+CATCH_RATE = 0.05  # Catch probability per second at aggression 1.0
+ENERGY_TRANSFER = 0.6  # Fraction of the prey's energy gained by the predator
+PREY_SATIATION = 0.6  # Hunger removed by one kill
+GRAZE_RADIUS = 1.5
+GRAZE_HUNGER = 0.2
+GRAZE_RATE = 1 / 60  # Hunger removed per second of grazing
+GRAZE_ENERGY = 1 / 30  # Energy moved from plant to grazer per second of grazing
+
+# Reproduction
+REPRODUCTION_ENERGY = 8.0  # Minimum energy before an entity can reproduce
+REPRODUCTION_SCALE = 1 / 600  # Birth chance per second = reproduction_rate * REPRODUCTION_SCALE
+ANIMAL_BIRTH_SPREAD = 1.0
+PLANT_SEED_SPREAD = 8.0
+PLANT_SPACING = 2.0  # Seeds landing closer than this to a living plant do not take root
+
+def generate_species_grid(json_data, num_per_species=10, rng=None, spawn_extent=50):
     """
     Generates species instances from species_templates if species_grid is missing.
     Places entities randomly in the world.
+
+    Parameters:
+        json_data (dict): Parsed species config.
+        num_per_species (int): Number of instances to create per template.
+        rng (np.random.Generator, optional): Random source; defaults to the global NumPy RNG.
+        spawn_extent (float): Entities spawn within [-spawn_extent, spawn_extent] on x and z.
     """
+    rng = rng if rng is not None else np.random
     species_templates = json_data.get("species_templates", {})
     if "species_grid" in json_data:
         return json_data  # If already defined, return as is
@@ -16,11 +68,12 @@ def generate_species_grid(json_data, num_per_species=10):
             species_grid.append({
                 "species": species_name,
                 "position": {
-                    "x": np.random.uniform(-50, 50),
+                    "x": rng.uniform(-spawn_extent, spawn_extent),
                     "y": 0,
-                    "z": np.random.uniform(-50, 50)
+                    "z": rng.uniform(-spawn_extent, spawn_extent)
                 },
                 "class": template.get("class", "Unknown"),
+                "type": template.get("type", "Unknown"),
                 "hunger": template.get("base_hunger", 0.5),
                 "water": template.get("base_water", 0.5),
                 "sleep": template.get("base_sleep", 0.5),
@@ -49,13 +102,16 @@ def convert_species_config_with_categorical(json_data):
     string_fields = ['class', 'species']
     mappings = {field: {val: idx for idx, val in enumerate(sorted({entry.get(field, "") for entry in species_list}))}
                 for field in string_fields}
+    mappings['type'] = dict(TYPE_CODES)
 
     # Define model type mapping
     model_types = {'cube': 0, 'sphere': 1, 'cone': 2, 'cylinder': 3}  # Expand as needed
 
     dtype = np.dtype([
-        ('class', 'i4'), ('species', 'i4'),
+        ('class', 'i4'), ('species', 'i4'), ('type', 'i4'),
+        ('asleep', '?'),
         ('x', 'f4'), ('y', 'f4'), ('z', 'f4'),
+        ('vx', 'f4'), ('vz', 'f4'),
         ('hunger', 'f4'), ('water', 'f4'), ('sleep', 'f4'),
         ('energy', 'f4'),
         ('reproduction_rate', 'f4'),
@@ -84,9 +140,12 @@ def convert_species_config_with_categorical(json_data):
         data.append((
             mappings['class'].get(entry.get("class", ""), 0),
             mappings['species'].get(species_name, 0),
+            TYPE_CODES.get(entry.get("type", ""), -1),
+            False,
             entry.get("position", {}).get("x", 0.0),
             entry.get("position", {}).get("y", 0.0),
             entry.get("position", {}).get("z", 0.0),
+            0.0, 0.0,
             entry.get("hunger", 0.0),
             entry.get("water", 0.0),
             entry.get("sleep", 0.0),
@@ -101,42 +160,338 @@ def convert_species_config_with_categorical(json_data):
     return np.array(data, dtype=dtype), mappings, model_data
 
 
+# Step kernels. They take a ColumnStore (or a slice of one) plus masks/index arrays, so the
+# serial EcoSim and the worker processes of parallel_sim share the same code.
+
+def decay_needs(e, is_animal, is_plant, dt, water_level=None):
+    """
+    Advances hunger, sleep/wake, thirst and energy for the masked animals and plants.
+    """
+    hunger, water, sleep, energy = e['hunger'], e['water'], e['sleep'], e['energy']
+
+    hunger[is_animal] = np.minimum(hunger[is_animal] + HUNGER_RATE * dt, 1.0)
+
+    # Sleep: awake animals tire until exhausted, then rest until fully recovered.
+    asleep = e['asleep']
+    awake = is_animal & ~asleep
+    resting = is_animal & asleep
+    sleep[awake] = np.maximum(sleep[awake] - FATIGUE_RATE * dt, 0.0)
+    sleep[resting] = np.minimum(sleep[resting] + SLEEP_RECOVERY_RATE * dt, 1.0)
+    asleep[awake & (sleep <= SLEEP_THRESHOLD)] = True
+    asleep[resting & (sleep >= WAKE_THRESHOLD)] = False
+
+    if water_level is not None:
+        water[is_animal] = np.maximum(water[is_animal] - THIRST_RATE * dt, 0.0)
+        drinking = is_animal & (e['y'] <= water_level + DRINK_MARGIN)
+        water[drinking] = np.minimum(water[drinking] + DRINK_RATE * dt, 1.0)
+
+    energy[is_animal] -= (BASE_ENERGY_DRAIN + STARVING_ENERGY_DRAIN * hunger[is_animal]) * dt
+    energy[is_plant] = np.minimum(energy[is_plant] + PLANT_ENERGY_GAIN * dt, MAX_ENERGY)
+
+
+def wander(e, is_animal, dt, rng):
+    """
+    Random movement for awake animals (replace with AI behavior later). Sets vx/vz and integrates x/z.
+    """
+    moving = is_animal & ~e['asleep']
+    n_moving = int(np.count_nonzero(moving))
+    e['vx'][moving] = rng.random(n_moving, dtype=np.float32) - 0.5
+    e['vz'][moving] = rng.random(n_moving, dtype=np.float32) - 0.5
+    e['vx'][~moving] = 0.0
+    e['vz'][~moving] = 0.0
+    e['x'] += e['vx'] * dt
+    e['z'] += e['vz'] * dt
+
+
+def grazer_mask(e, alive):
+    return alive & (e['type'] == TYPE_CODES['Prey']) & (e['hunger'] > GRAZE_HUNGER)
+
+
+def hunter_mask(e, alive):
+    return alive & (e['type'] == TYPE_CODES['Predator']) & (e['hunger'] >= HUNT_HUNGER)
+
+
+def find_grazing(e, grazers, plant_grid):
+    """
+    Pairs each grazer with one plant within GRAZE_RADIUS, using a grid indexing living plants.
+
+    Returns:
+        tuple: (grazer indices, plant indices)
+    """
+    q, j = plant_grid.query_pairs(e['x'][grazers], e['z'][grazers], GRAZE_RADIUS)
+    q, first = np.unique(q, return_index=True)
+    return grazers[q], j[first]
+
+
+def apply_grazing(e, grazers, plants, dt):
+    """
+    Moves energy from plants to their grazers; a plant shared by several grazers loses energy for each.
+    """
+    e['hunger'][grazers] = np.maximum(e['hunger'][grazers] - GRAZE_RATE * dt, 0.0)
+    e['energy'][grazers] = np.minimum(e['energy'][grazers] + GRAZE_ENERGY * dt, MAX_ENERGY)
+    np.subtract.at(e['energy'], plants, GRAZE_ENERGY * dt)
+
+
+def find_catches(e, hunters, prey_grid, dt, rng):
+    """
+    Rolls a catch for every hunter/prey pair within PREDATION_RADIUS, with a probability
+    scaled by the hunter's aggression. Contested prey are not resolved here; see pick_kills.
+
+    Returns:
+        tuple: (predator indices, prey indices) of successful catches.
+    """
+    q, prey = prey_grid.query_pairs(e['x'][hunters], e['z'][hunters], PREDATION_RADIUS)
+    pred = hunters[q]
+    caught = rng.random(len(pred)) < np.clip(e['aggression'][pred] * CATCH_RATE * dt, 0.0, 1.0)
+    return pred[caught], prey[caught]
+
+
+def pick_kills(pred, prey, rng):
+    """
+    Keeps one kill per prey and per predator; contested prey go to a random predator.
+    """
+    shuffle = rng.permutation(len(pred))
+    pred, prey = pred[shuffle], prey[shuffle]
+    _, first = np.unique(prey, return_index=True)
+    pred, prey = pred[first], prey[first]
+    _, first = np.unique(pred, return_index=True)
+    return pred[first], prey[first]
+
+
+def apply_kills(e, pred, prey):
+    """
+    Feeds predators from their kills. The caller removes the prey.
+    """
+    e['energy'][pred] = np.minimum(e['energy'][pred] + ENERGY_TRANSFER * np.maximum(e['energy'][prey], 0.0), MAX_ENERGY)
+    e['hunger'][pred] = np.maximum(e['hunger'][pred] - PREY_SATIATION, 0.0)
+
+
+def starved_mask(e, alive, water_level=None):
+    """
+    Living entities that ran out of energy, starved, or (when water is simulated) died of thirst.
+    """
+    starved = (e['energy'] <= 0) | (e['hunger'] >= 1.0)
+    if water_level is not None:
+        starved |= np.isin(e['type'], ANIMAL_TYPES) & (e['water'] <= 0)
+    return alive & starved
+
+
+def roll_births(e, alive, dt, rng):
+    """
+    Picks the well-fed, awake entities that reproduce this step, with a chance set by reproduction_rate.
+
+    Returns:
+        np.ndarray: Row indices of the parents.
+    """
+    ready = alive & ~e['asleep'] & (e['energy'] >= REPRODUCTION_ENERGY)
+    ready &= (e['type'] != TYPE_CODES['Predator']) | (e['hunger'] < HUNT_HUNGER)
+    ready &= (e['type'] != TYPE_CODES['Prey']) | (e['hunger'] < GRAZE_HUNGER)
+    candidates = np.flatnonzero(ready)
+    chance = np.clip(e['reproduction_rate'][candidates] * REPRODUCTION_SCALE * dt, 0.0, 1.0)
+    return candidates[rng.random(len(candidates)) < chance]
+
+
+def make_offspring(e, parents, rng):
+    """
+    Halves each parent's energy and returns offspring rows: animals are born nearby, plants
+    seed farther out, and aggression mutates by the parent's mutation_rate.
+    """
+    e['energy'][parents] *= 0.5
+    children = e[parents]
+    spread = np.where(np.isin(children['type'], PLANT_TYPES), PLANT_SEED_SPREAD, ANIMAL_BIRTH_SPREAD)
+    children['x'] += rng.uniform(-1, 1, len(children)) * spread
+    children['z'] += rng.uniform(-1, 1, len(children)) * spread
+    children['hunger'] = np.minimum(children['hunger'], GRAZE_HUNGER)
+    children['sleep'] = 1.0
+    children['vx'] = 0.0
+    children['vz'] = 0.0
+    mutation = children['mutation_rate']
+    children['aggression'] = np.clip(
+        children['aggression'] * (1 + rng.normal(0, 1, len(children)) * mutation), 0.0, 1.0
+    )
+    return children
+
+
 class EcoSim:
     """
     Optimized ecosystem simulation using vectorized NumPy operations.
     Entities are initialized from a structured array instead of being randomly generated.
+
+    Entity rows live in an EntityPool backed by a ColumnStore: `entities['x']` is a contiguous
+    column, `entities` covers every slot handed out so far and `alive` marks the ones in use,
+    so dead rows must be masked out by callers.
     """
 
-    def __init__(self, heightmap_func, species_array):
+    def __init__(self, heightmap_func, species_array, seed=None, cell_size=5.0, water_level=None):
         """
         Initializes the ecosystem simulation using the provided species data.
 
         Parameters:
             heightmap_func (callable): Function returning terrain height for given (x, z).
             species_array (np.ndarray): Structured array containing species attributes.
+            seed (int, optional): Seed for the simulation's private random generator.
+            cell_size (float): Cell size of the spatial index used for neighbor queries.
+            water_level (float, optional): Height of the water surface. Animals standing near it
+                drink; without it, thirst is not simulated.
         """
         self.heightmap_func = heightmap_func
-        self.entities = species_array.copy()  # Use structured NumPy array directly
+        self.pool = EntityPool(species_array.dtype, capacity=max(2 * len(species_array), 1024), hot_fields=HOT_FIELDS)
+        self.rng = np.random.default_rng(seed)
+        self.water_level = water_level
+        self.time = 0.0  # Accumulated simulation time in seconds
+        self.tick = 0
+
+        self.spawn(species_array)
+
+        # General-purpose index for neighbor queries, refreshed lazily when queried, plus
+        # per-role indexes sized to the interaction radii used by the step kernel.
+        self.grid = SpatialGrid(cell_size)
+        self._grid_tick = None
+        self._prey_grid = SpatialGrid(PREDATION_RADIUS)
+        self._plant_grid = SpatialGrid(GRAZE_RADIUS)
+
+    @classmethod
+    def restore(cls, heightmap_func, pool, rng, time, tick, water_level=None, cell_size=5.0):
+        """
+        Rebuilds a simulation around an existing EntityPool (e.g. one loaded from a snapshot)
+        without going through species config parsing.
+        """
+        sim = cls(heightmap_func, np.zeros(0, dtype=pool.dtype), cell_size=cell_size, water_level=water_level)
+        sim.pool = pool
+        sim.rng = rng
+        sim.time = time
+        sim.tick = tick
+        return sim
+
+    @property
+    def entities(self):
+        """Column store of all handed-out slots (dead ones included)."""
+        return self.pool.rows
+
+    @property
+    def alive(self):
+        """Boolean mask over `entities` marking living rows."""
+        return self.pool.alive
+
+    def spawn(self, rows):
+        """
+        Adds entities, snapping them to the terrain. Dead slots are reused before the pool grows.
+
+        Returns:
+            np.ndarray: Slot indices of the new entities.
+        """
+        rows = np.array(rows, dtype=self.pool.dtype)
+        rows['y'] = self.heightmap_func(rows['x'], rows['z'])
+        return self.pool.spawn(rows)
 
-        # Ensure y-position aligns with terrain height
-        self.entities['y'] = heightmap_func(self.entities['x'], self.entities['z'])
+    def kill(self, indices):
+        """
+        Removes entities by slot index; their slots are recycled by later spawns.
+        """
+        return self.pool.kill(indices)
 
     def step(self, dt):
         """
-        Advances the simulation by a time step 'dt'. Updates positions of mobile entities.
+        Advances the simulation by a time step 'dt': decays needs, moves awake animals,
+        resolves grazing and predation, and marks deaths. Every stage works on whole-array
+        masks; there is no per-entity Python loop. Births and deaths only touch the rows
+        that change.
 
         Parameters:
             dt (float): Time step increment.
         """
-        # Determine moving species (assuming class index 1+ are animals)
-        is_animal = self.entities['class'] > 0
+        e = self.entities
+        alive = self.alive
+        is_animal = alive & np.isin(e['type'], ANIMAL_TYPES)
+        is_plant = alive & np.isin(e['type'], PLANT_TYPES)
 
-        # Random movement for now (replace with AI behavior later)
-        self.entities['x'][is_animal] += (np.random.rand(np.sum(is_animal)) - 0.5) * dt
-        self.entities['z'][is_animal] += (np.random.rand(np.sum(is_animal)) - 0.5) * dt
+        decay_needs(e, is_animal, is_plant, dt, self.water_level)
+        wander(e, is_animal, dt, self.rng)
 
         # Update heightmap adjustment
-        self.entities['y'] = self.heightmap_func(self.entities['x'], self.entities['z'])
+        e['y'] = self.heightmap_func(e['x'], e['z'])
+
+        self._graze(dt)
+        self._resolve_predation(dt)
+        self.pool.kill(np.flatnonzero(starved_mask(e, self.alive, self.water_level)))
+        self._reproduce(dt)
+
+        self.time += dt
+        self.tick += 1
+
+    def _graze(self, dt):
+        """
+        Hungry prey standing near a plant eat from it.
+        """
+        e = self.entities
+        grazers = np.flatnonzero(grazer_mask(e, self.alive))
+        if len(grazers) == 0:
+            return
+        self._plant_grid.update(e['x'], e['z'], self.alive & np.isin(e['type'], PLANT_TYPES))
+        apply_grazing(e, *find_grazing(e, grazers, self._plant_grid), dt)
+
+    def _resolve_predation(self, dt):
+        """
+        Hungry predators catch nearby prey. Each prey is caught at most once and each
+        predator kills at most once per step.
+        """
+        e = self.entities
+        hunters = np.flatnonzero(hunter_mask(e, self.alive))
+        if len(hunters) == 0:
+            return
+        self._prey_grid.update(e['x'], e['z'], self.alive & (e['type'] == TYPE_CODES['Prey']))
+        pred, prey = pick_kills(*find_catches(e, hunters, self._prey_grid, dt, self.rng), self.rng)
+        apply_kills(e, pred, prey)
+        self.pool.kill(prey)
+
+    def _reproduce(self, dt):
+        parents = roll_births(self.entities, self.alive, dt, self.rng)
+        if len(parents):
+            self.spawn_offspring(parents)
+
+    def spawn_offspring(self, parents):
+        """
+        Spawns one offspring per parent slot. Seeds that land in another plant's shade fail,
+        which bounds plant density.
+
+        Returns:
+            np.ndarray: Slot indices of the new entities.
+        """
+        e = self.entities
+        children = make_offspring(e, parents, self.rng)
+        seeds = np.flatnonzero(np.isin(children['type'], PLANT_TYPES))
+        if len(seeds):
+            self._plant_grid.update(e['x'], e['z'], self.alive & np.isin(e['type'], PLANT_TYPES))
+            q, _ = self._plant_grid.query_pairs(children['x'][seeds], children['z'][seeds], PLANT_SPACING)
+            children = np.delete(children, seeds[np.unique(q)])
+        return self.spawn(children)
+
+    def _sync_grid(self):
+        if self._grid_tick != self.tick:
+            self.grid.update(self.entities['x'], self.entities['z'], self.alive)
+            self._grid_tick = self.tick
+
+    def neighbors(self, index, radius):
+        """
+        Returns indices of living entities within 'radius' of entity 'index' (excluding itself).
+        """
+        self._sync_grid()
+        found = self.grid.query_radius(self.entities['x'][index], self.entities['z'][index], radius)
+        return found[found != index]
+
+    def nearest(self, x, z, k):
+        """
+        Returns indices of the k living entities closest to the point (x, z), closest first.
+        """
+        self._sync_grid()
+        return self.grid.query_knn(x, z, k)
+
+    def pairs_within(self, radius, sources=None):
+        """
+        Returns (i, j) index arrays of living entity pairs closer than 'radius'. See SpatialGrid.pairs_within.
+        """
+        self._sync_grid()
+        return self.grid.pairs_within(radius, sources)
 
 def summarize_simulation(sim, mappings):
     """
@@ -156,9 +511,11 @@ def summarize_simulation(sim, mappings):
     # Aggregate species counts and dead counts
     species_counts = {}
     dead_counts = {}
-    for entity in sim.entities:
+    for entity, alive in zip(sim.entities, sim.alive):
         species_name = inv_species_map.get(entity["species"], "Unknown")
         species_counts[species_name] = species_counts.get(species_name, 0) + 1
+        if not alive:
+            dead_counts[species_name] = dead_counts.get(species_name, 0) + 1
 
     for species, count in species_counts.items():
         dead_count = dead_counts.get(species, 0)
@@ -166,11 +523,10 @@ def summarize_simulation(sim, mappings):
 
     # Detailed output for all entities
     print("\n=== Detailed Entity Data ===")
-    for entity in sim.entities:
+    for entity, alive in zip(sim.entities, sim.alive):
         species_name = inv_species_map.get(entity["species"], "Unknown")
         class_name = inv_class_map.get(entity["class"], "Unknown")
-        # Determine status; you can modify the condition based on your simulation's criteria.
-        status = "Existed"
+        status = "Alive" if alive else "Dead"
         print(
             f"Species: {species_name} ({class_name}) | Pos: ({entity['x']:.2f}, {entity['y']:.2f}, {entity['z']:.2f}) | "
             f"Energy: {entity['energy']:.2f} | Hunger: {entity['hunger']:.2f} | Aggression: {entity['aggression']:.2f} | "
@@ -181,23 +537,24 @@ def summarize_simulation(sim, mappings):
 
 
 
-# Load species config
-with open("species_config.json", "r") as f:
-    config = json.load(f)
+if __name__ == "__main__":
+    # Load species config
+    with open("species_config.json", "r") as f:
+        config = json.load(f)
 
-config = generate_species_grid(config)  # Auto-generate species if needed
-species_array, categorical_mappings, model_data = convert_species_config_with_categorical(config)
+    config = generate_species_grid(config)  # Auto-generate species if needed
+    species_array, categorical_mappings, model_data = convert_species_config_with_categorical(config)
 
-def heightmap_func(x, z):
-    return np.sin(x) + np.cos(z)  # Example terrain function
+    def heightmap_func(x, z):
+        return np.sin(x) + np.cos(z)  # Example terrain function
 
-# Initialize simulation
-sim = EcoSim(heightmap_func, species_array)
+    # Initialize simulation
+    sim = EcoSim(heightmap_func, species_array)
 
-# Step simulation
-sim.step(1000.1)
+    # Step simulation
+    sim.step(1000.1)
 
-print(species_array)
-print(sim.entities)
+    print(species_array)
+    print(sim.entities)
 
-summarize_simulation(sim, categorical_mappings)
+    summarize_simulation(sim, categorical_mappings)
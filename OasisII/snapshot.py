@@ -0,0 +1,148 @@
+"""
+Binary snapshots of an EcoSim run.
+
+File layout (little endian):
+    8 bytes   magic b'OASISNAP'
+    uint32    format version
+    uint32    header length in bytes
+    header    UTF-8 JSON: dtype, column table, categorical mappings, clock, RNG state, extras
+    columns   raw column bytes, each starting on a 64-byte boundary
+
+Columns are stored exactly as they sit in memory, so loading maps them straight from the
+file (copy-on-write) instead of parsing anything per entity.
+"""
+
+import os
+import json
+import struct
+import numpy as np
+from entity_pool import EntityPool
+from sim_init import EcoSim
+
+MAGIC = b'OASISNAP'
+VERSION = 1
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGN = 64
+
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _dtype_from_descr(descr):
+    return np.dtype([tuple(field[:2]) + ((tuple(field[2]),) if len(field) > 2 else ()) for field in descr])
+
+
+def save_snapshot(path, sim, mappings, game_time=None, extra=None):
+    """
+    Writes the simulation state to `path` (atomically, via a temporary file).
+
+    Parameters:
+        path (str): Destination file.
+        sim (EcoSim): Simulation to save.
+        mappings (dict): Categorical mappings from convert_species_config_with_categorical.
+        game_time (float, optional): Renderer-side game clock (e.g. Oasis.game_start_time).
+        extra (dict, optional): Additional JSON-serializable data to store alongside.
+    """
+    pool = sim.pool
+    arrays = {name: np.ascontiguousarray(col[:pool.size]) for name, col in pool.data.columns.items()}
+    arrays['__alive__'] = np.ascontiguousarray(pool._alive[:pool.size])
+    arrays['__free__'] = np.ascontiguousarray(pool._free[:pool._free_count])
+    arrays['__generations__'] = np.ascontiguousarray(pool._generations[:pool.size])
+
+    table = {}
+    offset = 0
+    for name, arr in arrays.items():
+        table[name] = {'offset': offset, 'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+        offset = _align(offset + arr.nbytes)
+
+    header = {
+        'dtype': pool.dtype.descr,
+        'hot_fields': list(pool.data.hot_fields),
+        'size': pool.size,
+        'count': pool.count,
+        'columns': table,
+        'mappings': mappings,
+        'time': sim.time,
+        'tick': sim.tick,
+        'water_level': sim.water_level,
+        'cell_size': sim.grid.cell_size,
+        'rng': sim.rng.bit_generator.state,
+        'game_time': game_time,
+        'extra': extra or {},
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + table[name]['offset'])
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    """
+    Returns (header dict, byte offset of the column data) without touching the columns.
+    """
+    with open(path, 'rb') as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an Oasis snapshot")
+        if version > VERSION:
+            raise ValueError(f"{path} uses snapshot format {version}; this build reads up to {VERSION}")
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    return header, _align(_PREAMBLE.size + header_len)
+
+
+def load_snapshot(path, heightmap_func, mmap=True):
+    """
+    Restores a simulation saved by save_snapshot.
+
+    Parameters:
+        path (str): Snapshot file.
+        heightmap_func (callable): Terrain height function for the restored EcoSim.
+        mmap (bool): Map columns copy-on-write from the file instead of reading them into memory.
+            Pages are only read when touched, and writes never reach the file.
+
+    Returns:
+        tuple: (EcoSim, categorical mappings, header dict with 'game_time' and 'extra')
+    """
+    header, data_start = read_header(path)
+
+    def column(name):
+        spec = header['columns'][name]
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(spec['shape'])
+        if mmap and spec['shape'][0] > 0:
+            return np.memmap(path, dtype=dtype, mode='c', offset=data_start + spec['offset'], shape=shape)
+        count = int(np.prod(shape))
+        with open(path, 'rb') as f:
+            f.seek(data_start + spec['offset'])
+            return np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+    dtype = _dtype_from_descr(header['dtype'])
+    size = header['size']
+    pool = EntityPool(dtype, capacity=max(size, 1), hot_fields=header['hot_fields'])
+    if size:
+        # Growing the pool later copies these mapped columns into ordinary arrays.
+        pool.data.columns = {name: column(name) for name in dtype.names}
+        pool._alive = column('__alive__')
+    free = column('__free__')
+    pool._free[:len(free)] = free
+    pool._free_count = len(free)
+    pool._generations[:size] = column('__generations__')
+    pool.size = size
+    pool.count = header['count']
+
+    rng_state = header['rng']
+    rng = np.random.Generator(getattr(np.random, rng_state['bit_generator'])())
+    rng.bit_generator.state = rng_state
+
+    sim = EcoSim.restore(heightmap_func, pool, rng, header['time'], header['tick'],
+                         water_level=header['water_level'], cell_size=header['cell_size'])
+    return sim, header['mappings'], header
@@ -0,0 +1,241 @@
+"""
+Uniform-grid spatial hash over the x/z plane for EcoSim neighbor queries.
+
+Entities are bucketed by integer cell coordinates and sorted by cell key, so every
+cell is a contiguous run of an index array. Queries gather candidate runs from the
+covered cells and filter them by exact distance, all without per-entity Python work.
+"""
+
+import numpy as np
+
+# Cell coordinates are packed into one int64 key: cx * _KEY_STRIDE + cz.
+_KEY_STRIDE = np.int64(1 << 31)
+_KEY_OFFSET = np.int64(1 << 30)
+
+# Occupied areas up to this many cells get a dense cell table, turning cell lookups into a
+# plain gather instead of a binary search; larger ones fall back to the search. The table is
+# kept between rebuilds and only the cells filled last time are cleared, so its cost stays
+# bounded (two int32 tables, 32 MB at most) no matter how many entities there are.
+_DENSE_TABLE_MAX_CELLS = 1 << 22
+
+
+def _expand_ranges(starts, counts):
+    """
+    Concatenates np.arange(start, start + count) for every (start, count) pair.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.cumsum(counts)
+    offsets = np.repeat(ends - counts, counts)
+    return np.repeat(np.asarray(starts, dtype=np.int64), counts) + (np.arange(total) - offsets)
+
+
+class SpatialGrid:
+    """
+    Vectorized spatial hash of 2D points (x, z).
+
+    Call rebuild() or update() once per tick with the current coordinates, then run
+    query_radius / query_knn / pairs_within against that state. All queries return
+    indices into the arrays that were passed in.
+    """
+
+    def __init__(self, cell_size=5.0):
+        """
+        Parameters:
+            cell_size (float): Edge length of a grid cell; pick it near the typical query radius.
+        """
+        self.cell_size = float(cell_size)
+        self.x = np.empty(0, dtype=np.float32)
+        self.z = np.empty(0, dtype=np.float32)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int64)  # Entity indices covered by the index
+        self.order = np.empty(0, dtype=np.int64)  # Entity indices sorted by cell key
+        self.cell_keys = np.empty(0, dtype=np.int64)  # Unique occupied cell keys (sorted)
+        self.cell_starts = np.empty(0, dtype=np.int64)  # Start of each cell's run in self.order
+        self.cell_counts = np.empty(0, dtype=np.int64)
+        self.dense = None  # (cx0, cz0, width, height, starts, counts) when a dense table is in use
+        self._table_starts = np.zeros(0, dtype=np.int32)  # Dense table buffers, reused between rebuilds
+        self._table_counts = np.zeros(0, dtype=np.int32)
+        self._table_filled = np.empty(0, dtype=np.int64)  # Cells of the table holding a run
+
+    def _cell_coords(self, x, z):
+        cx = np.floor(np.asarray(x) / self.cell_size).astype(np.int64)
+        cz = np.floor(np.asarray(z) / self.cell_size).astype(np.int64)
+        return cx, cz
+
+    def _pack(self, cx, cz):
+        return (cx + _KEY_OFFSET) * _KEY_STRIDE + (cz + _KEY_OFFSET)
+
+    def rebuild(self, x, z, mask=None):
+        """
+        Rebuilds the index from scratch.
+
+        Parameters:
+            x, z (np.ndarray): Entity coordinates.
+            mask (np.ndarray, optional): Boolean array; only True entries are indexed.
+        """
+        self.x = np.asarray(x)
+        self.z = np.asarray(z)
+        self.keys = self._pack(*self._cell_coords(self.x, self.z))
+        indices = np.arange(len(self.keys)) if mask is None else np.flatnonzero(mask)
+        self._sort(indices)
+
+    def update(self, x, z, mask=None):
+        """
+        Refreshes the index for new coordinates, re-sorting only if some entity changed cells.
+
+        Most ticks move entities by a fraction of a cell, in which case the bucket layout is
+        reused as-is and only the coordinates used for distance filtering are swapped in.
+        """
+        x = np.asarray(x)
+        z = np.asarray(z)
+        keys = self._pack(*self._cell_coords(x, z))
+        indices = np.arange(len(keys)) if mask is None else np.flatnonzero(mask)
+        self.x, self.z = x, z
+        if np.array_equal(indices, self.indices) and np.array_equal(keys, self.keys):
+            return
+        self.keys = keys
+        self._sort(indices)
+
+    def _sort(self, indices):
+        self.indices = indices
+        order = indices[np.argsort(self.keys[indices], kind='stable')]
+        sorted_keys = self.keys[order]
+        self.order = order
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            sorted_keys, return_index=True, return_counts=True
+        )
+
+        self.dense = None
+        self._table_counts[self._table_filled] = 0  # Empty cells only need a zero count
+        self._table_filled = self._table_filled[:0]
+        if len(self.cell_keys):
+            cx = self.cell_keys // _KEY_STRIDE - _KEY_OFFSET
+            cz = self.cell_keys % _KEY_STRIDE - _KEY_OFFSET
+            cx0, cz0 = int(cx.min()), int(cz.min())
+            width, height = int(cx.max()) - cx0 + 1, int(cz.max()) - cz0 + 1
+            if width * height <= _DENSE_TABLE_MAX_CELLS:
+                if width * height > len(self._table_counts):
+                    self._table_starts = np.zeros(width * height, dtype=np.int32)
+                    self._table_counts = np.zeros(width * height, dtype=np.int32)
+                flat = (cx - cx0) * height + (cz - cz0)
+                self._table_starts[flat] = self.cell_starts
+                self._table_counts[flat] = self.cell_counts
+                self._table_filled = flat
+                self.dense = (cx0, cz0, width, height, self._table_starts, self._table_counts)
+
+    def _lookup(self, cx, cz):
+        """
+        Returns (starts, counts) into self.order for arrays of cell coordinates; empty cells get count 0.
+        """
+        cx = np.asarray(cx, dtype=np.int64)
+        cz = np.asarray(cz, dtype=np.int64)
+        if self.dense is not None:
+            cx0, cz0, width, height, table_starts, table_counts = self.dense
+            lx, lz = cx - cx0, cz - cz0
+            inside = (lx >= 0) & (lx < width) & (lz >= 0) & (lz < height)
+            flat = np.where(inside, lx * height + lz, 0)
+            return table_starts[flat], np.where(inside, table_counts[flat], 0)
+
+        keys = self._pack(cx, cz)
+        if len(self.cell_keys) == 0:
+            return np.zeros(keys.shape, dtype=np.int64), np.zeros(keys.shape, dtype=np.int64)
+        pos = np.searchsorted(self.cell_keys, keys)
+        pos_clipped = np.minimum(pos, len(self.cell_keys) - 1)
+        found = self.cell_keys[pos_clipped] == keys
+        starts = np.where(found, self.cell_starts[pos_clipped], 0)
+        counts = np.where(found, self.cell_counts[pos_clipped], 0)
+        return starts, counts
+
+    def _candidates_in_box(self, x, z, reach):
+        cx0, cz0 = self._cell_coords(x - reach, z - reach)
+        cx1, cz1 = self._cell_coords(x + reach, z + reach)
+        cxs, czs = np.meshgrid(np.arange(cx0, cx1 + 1), np.arange(cz0, cz1 + 1), indexing='ij')
+        starts, counts = self._lookup(cxs.ravel(), czs.ravel())
+        return self.order[_expand_ranges(starts, counts)]
+
+    def query_radius(self, x, z, radius):
+        """
+        Returns indices of all indexed entities within `radius` of the point (x, z).
+        """
+        candidates = self._candidates_in_box(x, z, radius)
+        d2 = (self.x[candidates] - x) ** 2 + (self.z[candidates] - z) ** 2
+        return candidates[d2 <= radius * radius]
+
+    def query_knn(self, x, z, k):
+        """
+        Returns indices of the k indexed entities nearest to (x, z), closest first.
+
+        Searches rings of cells outward until k candidates are found and the search box
+        is wide enough that no unvisited cell could hold a closer entity.
+        """
+        total = len(self.order)
+        k = min(int(k), total)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        reach = self.cell_size
+        while True:
+            candidates = self._candidates_in_box(x, z, reach)
+            if len(candidates) >= k or len(candidates) == total:
+                d2 = (self.x[candidates] - x) ** 2 + (self.z[candidates] - z) ** 2
+                nearest = np.argpartition(d2, k - 1)[:k] if len(candidates) > k else np.arange(len(candidates))
+                nearest = nearest[np.argsort(d2[nearest], kind='stable')]
+                # Anything outside the box is at least `reach` away.
+                if d2[nearest[-1]] <= reach * reach or len(candidates) == total:
+                    return candidates[nearest]
+            reach *= 2
+
+    def query_pairs(self, x, z, radius):
+        """
+        Radius query for many points at once, e.g. points indexed in a different grid.
+
+        Parameters:
+            x, z (np.ndarray): Query point coordinates.
+            radius (float): Search radius.
+
+        Returns:
+            tuple: (q, j) int64 arrays; j is an indexed entity within `radius` of query point q.
+        """
+        x = np.asarray(x)
+        z = np.asarray(z)
+        if len(x) == 0 or len(self.order) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        reach = int(np.ceil(radius / self.cell_size))
+        cx, cz = self._cell_coords(x, z)
+        queries = np.arange(len(x), dtype=np.int64)
+        r2 = radius * radius
+        all_q, all_j = [], []
+        for dx in range(-reach, reach + 1):
+            for dz in range(-reach, reach + 1):
+                starts, counts = self._lookup(cx + dx, cz + dz)
+                q = np.repeat(queries, counts)
+                j = self.order[_expand_ranges(starts, counts)]
+                d2 = (np.repeat(x, counts) - self.x[j]) ** 2 + (np.repeat(z, counts) - self.z[j]) ** 2
+                close = d2 <= r2
+                all_q.append(q[close])
+                all_j.append(j[close])
+        return np.concatenate(all_q), np.concatenate(all_j)
+
+    def pairs_within(self, radius, sources=None):
+        """
+        Finds all index pairs (i, j) of indexed entities with distance <= radius, i != j.
+
+        Parameters:
+            radius (float): Interaction radius.
+            sources (np.ndarray, optional): Restrict i to these entity indices (must be indexed).
+                Without it every unordered pair is returned once (i < j).
+
+        Returns:
+            tuple: (i, j) int64 index arrays of equal length.
+        """
+        unordered = sources is None
+        sources = self.order if sources is None else np.asarray(sources, dtype=np.int64)
+        q, j = self.query_pairs(self.x[sources], self.z[sources], radius)
+        i = sources[q]
+        keep = (i < j) if unordered else (i != j)
+        return i[keep], j[keep]
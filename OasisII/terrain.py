@@ -0,0 +1,143 @@
+"""
+Terrain height: the analytic formula and sampling from a precomputed heightmap.
+
+This is the one place the terrain formula lives. Renderers, EcoSim, spawning and collision
+all sample a Heightfield: ground height and surface normal come from bilinear interpolation
+of a regular grid, so a lookup costs the same no matter how finely the terrain is meshed,
+and no collision mesh or ray cast is needed to stand on it. Points off the grid are
+evaluated with the analytic formula, element by element.
+"""
+
+import functools
+import numpy as np
+if __package__:  # Imported as OasisII.terrain by the top-level scripts
+    from .terrain_cache import cached_arrays
+else:  # Imported by bare name by the scripts inside OasisII
+    from terrain_cache import cached_arrays
+
+FORMULA_VERSION = 1  # Bump when analytic_height changes, so cached terrain is regenerated
+
+
+def analytic_height(x, z, height_scale=80):
+    """
+    Evaluates the terrain formula for scalars or arrays of (x, z).
+    """
+    height1 = np.sin(x * 0.01) * np.cos(z * 0.01) * height_scale
+    height2 = np.sin(x * 0.03 + 1.0) * np.cos(z * 0.03 + 2.0) * height_scale * 0.3
+    return height1 + height2
+
+
+def height_grid(world_size, height_scale=80, spacing=1.0, dtype=np.float64):
+    """
+    Samples the terrain formula on a regular grid covering [-world_size/2, world_size/2).
+
+    Returns:
+        tuple: (heights indexed [z, x], world (x, z) of heights[0, 0])
+    """
+    x = np.arange(-world_size // 2, world_size // 2, spacing, dtype=np.float64)
+    X, Z = np.meshgrid(x, x)
+    return analytic_height(X, Z, height_scale).astype(dtype, copy=False), (x[0], x[0])
+
+
+class Heightfield:
+    """
+    Regular grid of terrain heights with bilinear height and normal lookups.
+
+    heights[iz, ix] is the height at world (origin_x + ix * spacing, origin_z + iz * spacing),
+    the layout np.meshgrid(x, z) produces. Points outside the grid are passed to `fallback`
+    if one is given, otherwise they take the height of the nearest edge.
+    """
+
+    def __init__(self, heights, origin=(0.0, 0.0), spacing=1.0, fallback=None):
+        """
+        Parameters:
+            heights (np.ndarray): 2D array of heights, indexed [z, x]. float32 halves the memory.
+            origin (tuple): World (x, z) of heights[0, 0].
+            spacing (float): World distance between neighbouring samples.
+            fallback (callable, optional): Vectorized fallback(x, z) for points off the grid.
+        """
+        self.heights = np.asarray(heights)
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.spacing = float(spacing)
+        self.fallback = fallback
+        self.params = None  # Generation parameters, when known; keys caches of data derived from this terrain
+        self.rows, self.cols = self.heights.shape
+        self.extent = (self.origin[0] + (self.cols - 1) * self.spacing,
+                       self.origin[1] + (self.rows - 1) * self.spacing)
+
+    @classmethod
+    def analytic(cls, world_size, height_scale=80, spacing=1.0, dtype=np.float64, cache_dir=None):
+        """
+        Heightfield of the terrain formula over the world, falling back to the formula off the grid.
+
+        With a cache_dir, the grid is generated once and memory-mapped from disk on later calls.
+        """
+        params = {'formula': FORMULA_VERSION, 'world_size': world_size, 'height_scale': height_scale,
+                  'spacing': spacing, 'dtype': np.dtype(dtype).str}
+
+        def build():
+            heights, origin = height_grid(world_size, height_scale, spacing, dtype)
+            return heights, np.asarray(origin)
+
+        heights, origin = cached_arrays(cache_dir, 'heights', params, build, ('heights', 'origin'))
+        field = cls(heights, origin, spacing, functools.partial(analytic_height, height_scale=height_scale))
+        field.params = params
+        return field
+
+    def _outside(self, x, z):
+        return (x < self.origin[0]) | (x > self.extent[0]) | (z < self.origin[1]) | (z > self.extent[1])
+
+    def _cells(self, x, z):
+        fx = np.clip((np.asarray(x, dtype=np.float64) - self.origin[0]) / self.spacing, 0, self.cols - 1)
+        fz = np.clip((np.asarray(z, dtype=np.float64) - self.origin[1]) / self.spacing, 0, self.rows - 1)
+        ix = np.minimum(fx.astype(np.int64), self.cols - 2)
+        iz = np.minimum(fz.astype(np.int64), self.rows - 2)
+        h = self.heights
+        return fx - ix, fz - iz, h[iz, ix], h[iz, ix + 1], h[iz + 1, ix], h[iz + 1, ix + 1]
+
+    def height(self, x, z):
+        """
+        Ground height at (x, z). Accepts scalars or arrays of any matching shape.
+        """
+        if np.isscalar(x) and np.isscalar(z):
+            return self._height_scalar(x, z)
+        x, z = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(z, dtype=np.float64))
+        tx, tz, h00, h10, h01, h11 = self._cells(x, z)
+        h = np.asarray((h00 * (1 - tx) + h10 * tx) * (1 - tz) + (h01 * (1 - tx) + h11 * tx) * tz, dtype=np.float64)
+        if self.fallback is not None:
+            outside = self._outside(x, z)
+            if outside.any():
+                h[outside] = self.fallback(x[outside], z[outside])
+        return h
+
+    def _height_scalar(self, x, z):
+        # Plain float arithmetic: per-entity calls from game loops would spend more time in NumPy overhead
+        if self.fallback is not None and not (self.origin[0] <= x <= self.extent[0]
+                                              and self.origin[1] <= z <= self.extent[1]):
+            return float(self.fallback(x, z))
+        fx = min(max((x - self.origin[0]) / self.spacing, 0.0), self.cols - 1)
+        fz = min(max((z - self.origin[1]) / self.spacing, 0.0), self.rows - 1)
+        ix = min(int(fx), self.cols - 2)
+        iz = min(int(fz), self.rows - 2)
+        tx, tz = fx - ix, fz - iz
+        row0, row1 = self.heights[iz], self.heights[iz + 1]
+        return float((row0[ix] * (1 - tx) + row0[ix + 1] * tx) * (1 - tz)
+                     + (row1[ix] * (1 - tx) + row1[ix + 1] * tx) * tz)
+
+    def normal(self, x, z):
+        """
+        Unit surface normal at (x, z), shaped (..., 3), from the slope of the bilinear patch
+        (or of the fallback, by central differences, off the grid).
+        """
+        x, z = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(z, dtype=np.float64))
+        tx, tz, h00, h10, h01, h11 = self._cells(x, z)
+        dx = np.asarray(((h10 - h00) * (1 - tz) + (h11 - h01) * tz) / self.spacing, dtype=np.float64)
+        dz = np.asarray(((h01 - h00) * (1 - tx) + (h11 - h10) * tx) / self.spacing, dtype=np.float64)
+        if self.fallback is not None:
+            outside = self._outside(x, z)
+            if outside.any():
+                ox, oz, s = x[outside], z[outside], self.spacing
+                dx[outside] = (self.fallback(ox + s, oz) - self.fallback(ox - s, oz)) / (2 * s)
+                dz[outside] = (self.fallback(ox, oz + s) - self.fallback(ox, oz - s)) / (2 * s)
+        n = np.stack((-dx, np.ones_like(dx), -dz), axis=-1)
+        return n / np.linalg.norm(n, axis=-1, keepdims=True)
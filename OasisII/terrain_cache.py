@@ -0,0 +1,53 @@
+"""
+On-disk cache for generated terrain data (heightmaps, mesh buffers).
+
+Each entry is a set of .npy files named after a hash of the parameters that produced
+them, so changing any parameter (or bumping the formula version) simply misses the cache.
+Hits are memory-mapped read-only instead of loaded, so startup only touches the pages
+that are actually used.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+
+def cache_key(params):
+    """Short stable hash of a JSON-serializable parameter dict."""
+    blob = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def cached_arrays(cache_dir, kind, params, build, names):
+    """
+    Returns the arrays for `params` from the cache, building and storing them on a miss.
+
+    Parameters:
+        cache_dir (str or None): Cache directory; None disables caching.
+        kind (str): Entry type, used as the file name prefix (e.g. 'heights').
+        params (dict): Everything the arrays depend on.
+        build (callable): Returns the arrays, in the order of `names`, on a miss.
+        names (tuple): Names of the arrays.
+
+    Returns:
+        tuple: The arrays, memory-mapped read-only when they came from the cache.
+    """
+    if cache_dir is None:
+        return tuple(build())
+
+    key = cache_key(params)
+    paths = [os.path.join(cache_dir, f"{kind}-{key}.{name}.npy") for name in names]
+    if all(os.path.exists(path) for path in paths):
+        try:
+            return tuple(np.load(path, mmap_mode='r') for path in paths)
+        except (OSError, ValueError):
+            pass  # Truncated or corrupt entry: rebuild it below
+
+    arrays = tuple(build())
+    os.makedirs(cache_dir, exist_ok=True)
+    for path, array in zip(paths, arrays):
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, np.ascontiguousarray(array))
+        os.replace(tmp_path, path)
+    return arrays
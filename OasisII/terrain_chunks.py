@@ -0,0 +1,179 @@
+"""
+Chunked terrain with distance-based level of detail.
+
+The world is cut into a grid of square chunks. Each chunk is meshed at a resolution picked
+from its distance to a focus entity (usually the player): full resolution nearby, halving
+with every doubling of distance. Neighbouring chunks at different levels share every other
+edge vertex, and the cracks in between are hidden by skirts, a strip of wall hanging down
+from each chunk edge. Chunks are only re-meshed when their level changes.
+"""
+
+import numpy as np
+from ursina import Entity
+if __package__:  # Imported as OasisII.terrain_chunks by the top-level scripts
+    from .mesh_builder import build_geom_node
+    from .terrain_cache import cached_arrays
+else:  # Imported by bare name by the scripts inside OasisII
+    from mesh_builder import build_geom_node
+    from terrain_cache import cached_arrays
+
+MESH_VERSION = 1  # Bump when chunk_arrays changes, so cached chunk meshes are rebuilt
+
+
+def chunk_arrays(height_func, x0, z0, size, resolution, world_size, skirt_depth):
+    """
+    Builds the mesh arrays of one chunk.
+
+    Parameters:
+        height_func (callable): Vectorized terrain height, height_func(x, z) -> y.
+        x0, z0 (float): Corner of the chunk with the lowest coordinates.
+        size (float): Chunk edge length.
+        resolution (int): Quads per chunk edge.
+        world_size (float): World edge length, for world-continuous UVs.
+        skirt_depth (float): How far skirts hang below the chunk edge; 0 for no skirts.
+
+    Returns:
+        tuple: (vertices, triangles, uvs, normals) as NumPy arrays.
+    """
+    n = resolution + 1
+    step = size / resolution
+
+    # Sample one ring past the edges so normals are central differences that match across chunks
+    coords = np.arange(-1, n + 1) * step
+    X, Z = np.meshgrid(x0 + coords, z0 + coords)
+    H = height_func(X, Z)
+    Y = H[1:-1, 1:-1]
+    dx = (H[1:-1, 2:] - H[1:-1, :-2]) / (2 * step)
+    dz = (H[2:, 1:-1] - H[:-2, 1:-1]) / (2 * step)
+    normals = np.stack((-dx, np.ones_like(dx), -dz), axis=-1).reshape(-1, 3)
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+
+    X, Z = X[1:-1, 1:-1], Z[1:-1, 1:-1]
+    vertices = np.column_stack((X.ravel(), Y.ravel(), Z.ravel()))
+    idx = np.arange(n * n).reshape(n, n)
+    triangles = np.vstack((
+        np.column_stack([idx[:-1, :-1].ravel(), idx[1:, :-1].ravel(), idx[:-1, 1:].ravel()]),
+        np.column_stack([idx[1:, :-1].ravel(), idx[1:, 1:].ravel(), idx[:-1, 1:].ravel()])
+    ))
+
+    if skirt_depth:
+        vertices, triangles, normals = _add_skirts(idx, vertices, triangles, normals, skirt_depth)
+
+    uvs = (vertices[:, [0, 2]] + world_size / 2) / world_size
+    return vertices, triangles, uvs, normals
+
+
+def _add_skirts(idx, vertices, triangles, normals, skirt_depth):
+    """Walks the border of the vertex grid once around and hangs a copy of it skirt_depth lower."""
+    n = len(idx)
+    border = np.concatenate((idx[0, :-1], idx[:-1, -1], idx[-1, :0:-1], idx[:0:-1, 0]))
+    skirt = np.arange(n * n, n * n + len(border))
+    following = np.roll(border, -1)
+    following_skirt = np.roll(skirt, -1)
+    skirt_triangles = np.vstack((
+        np.column_stack((border, skirt, following)),
+        np.column_stack((following, skirt, following_skirt)),
+    ))
+    vertices = np.vstack((vertices, vertices[border] - (0, skirt_depth, 0)))
+    normals = np.vstack((normals, normals[border]))
+    triangles = np.vstack((triangles, skirt_triangles))
+    return vertices, triangles, normals
+
+
+class ChunkedTerrain(Entity):
+    """
+    Grid of terrain chunks whose resolution follows the distance to `focus`.
+    """
+
+    def __init__(self, height_func, world_size, focus=None, chunk_size=125, resolution=64, levels=5,
+                 lod_distance=None, skirt_depth=None, collider_levels=1, rebuilds_per_frame=4,
+                 chunk_kwargs=None, cache_dir=None, terrain_params=None, **kwargs):
+        """
+        Parameters:
+            height_func (callable): Vectorized terrain height, height_func(x, z) -> y.
+            world_size (float): World edge length; the terrain spans [-world_size/2, world_size/2).
+            focus (Entity, optional): Entity the detail follows, e.g. the player.
+            chunk_size (float): Chunk edge length.
+            resolution (int): Quads per chunk edge at the finest level.
+            levels (int): Number of detail levels; each halves the resolution of the previous one.
+            lod_distance (float, optional): Distance up to which chunks use the finest level;
+                each further level starts at twice the distance. Defaults to 1.5 chunk sizes.
+            skirt_depth (float, optional): Skirt length; defaults to one coarsest-level cell.
+            collider_levels (int): Chunks below this level get a mesh collider.
+            rebuilds_per_frame (int): Chunks re-meshed per frame at most, nearest first.
+            chunk_kwargs (dict, optional): Extra Entity arguments for every chunk (texture, shader, ...).
+            cache_dir (str, optional): Directory to cache chunk mesh buffers in (see terrain_cache.py).
+            terrain_params (dict, optional): Parameters identifying the terrain `height_func` samples,
+                e.g. Heightfield.params. Chunk meshes are only cached when this is given.
+        """
+        super().__init__(**kwargs)
+        self.height_func = height_func
+        self.world_size = world_size
+        self.focus = focus
+        self.chunk_size = chunk_size
+        self.resolution = resolution
+        self.levels = levels
+        self.lod_distance = lod_distance or 1.5 * chunk_size
+        self.skirt_depth = skirt_depth or chunk_size / max(resolution >> (levels - 1), 1)
+        self.collider_levels = collider_levels
+        self.rebuilds_per_frame = rebuilds_per_frame
+        self.chunk_kwargs = chunk_kwargs or {}
+        self.cache_dir = cache_dir if terrain_params is not None else None
+        self.terrain_params = terrain_params
+
+        count = int(np.ceil(world_size / chunk_size))
+        self.origins = -world_size / 2 + np.arange(count) * chunk_size
+        cx, cz = np.meshgrid(self.origins + chunk_size / 2, self.origins + chunk_size / 2, indexing='ij')
+        self.centers = np.column_stack((cx.ravel(), cz.ravel()))
+        self.chunk_levels = np.full(len(self.centers), -1)
+        self.chunks = [None] * len(self.centers)
+        self.refresh(rebuild_all=True)
+
+    def target_levels(self, x, z):
+        """Detail level each chunk should have for a focus at (x, z)."""
+        d = np.hypot(self.centers[:, 0] - x, self.centers[:, 1] - z)
+        levels = np.floor(np.log2(np.maximum(d, 1e-6) / self.lod_distance)) + 1
+        return np.clip(levels, 0, self.levels - 1).astype(int)
+
+    def refresh(self, rebuild_all=False):
+        """
+        Re-meshes chunks whose level changed, nearest first, up to rebuilds_per_frame
+        (or all of them when rebuild_all is set).
+        """
+        x, z = (self.focus.x, self.focus.z) if self.focus else (0.0, 0.0)
+        targets = self.target_levels(x, z)
+        stale = np.flatnonzero(targets != self.chunk_levels)
+        if not len(stale):
+            return
+        d = np.hypot(self.centers[stale, 0] - x, self.centers[stale, 1] - z)
+        stale = stale[np.argsort(d)]
+        if not rebuild_all:
+            stale = stale[:self.rebuilds_per_frame]
+        for i in stale:
+            self.build_chunk(i, targets[i])
+
+    def build_chunk(self, i, level):
+        resolution = max(self.resolution >> level, 1)
+        x0, z0 = (float(c) for c in self.centers[i] - self.chunk_size / 2)
+        params = {'mesh': MESH_VERSION, 'terrain': self.terrain_params, 'x0': x0, 'z0': z0,
+                  'size': self.chunk_size, 'resolution': resolution, 'world_size': self.world_size,
+                  'skirt_depth': self.skirt_depth}
+        vertices, triangles, uvs, normals = cached_arrays(
+            self.cache_dir, 'chunk', params,
+            lambda: chunk_arrays(self.height_func, x0, z0, self.chunk_size, resolution, self.world_size,
+                                 self.skirt_depth),
+            ('vertices', 'triangles', 'uvs', 'normals'))
+        mesh = build_geom_node(vertices, triangles, normals, uvs, name=f'terrain_chunk_{i}')
+        chunk = self.chunks[i]
+        if chunk is None:
+            chunk = Entity(parent=self, model=mesh, **self.chunk_kwargs)
+            self.chunks[i] = chunk
+        else:
+            chunk.model = mesh
+            if 'texture_scale' in self.chunk_kwargs:
+                chunk.texture_scale = self.chunk_kwargs['texture_scale']
+        chunk.collider = 'mesh' if level < self.collider_levels else None
+        self.chunk_levels[i] = level
+
+    def update(self):
+        self.refresh()
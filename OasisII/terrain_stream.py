@@ -0,0 +1,234 @@
+"""
+Endless terrain, streamed in chunks around a moving focus.
+
+Chunks sit on an unbounded integer grid. Whenever the focus (usually the player) enters
+another chunk, the chunks within `view_distance` of a point ahead of it along its direction of
+travel are queued, nearest to that point first, each at the level of detail its distance to
+the focus calls for (the same rule ChunkedTerrain uses). A worker pool samples the heights
+and normals and builds the mesh arrays; the render thread only polls for finished work and
+turns at most `uploads_per_frame` results into GeomNodes per frame, so a frame never waits on
+generation. Loaded chunks are kept in least-recently-wanted order and the oldest ones are
+evicted once more than `max_chunks` are loaded.
+"""
+
+import math
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ursina import Entity, destroy, time
+from mesh_builder import build_geom_node
+from terrain_cache import cached_arrays
+from terrain_chunks import MESH_VERSION, chunk_arrays
+
+
+def generate_chunk(height_func, x0, z0, size, resolution, uv_size, skirt_depth, cache_dir=None, params=None):
+    """
+    Builds (or loads from the cache) the mesh arrays of one chunk. Runs on a worker, so it
+    touches no scene state; module level so process pools can pickle it.
+    """
+    return cached_arrays(
+        cache_dir, 'chunk', params,
+        lambda: chunk_arrays(height_func, x0, z0, size, resolution, uv_size, skirt_depth),
+        ('vertices', 'triangles', 'uvs', 'normals'))
+
+
+class StreamingTerrain(Entity):
+    """
+    Terrain without bounds: chunks are generated in the background ahead of `focus` and
+    evicted least recently wanted first.
+    """
+
+    def __init__(self, height_func, focus, chunk_size=125, resolution=64, levels=4, view_distance=1000,
+                 lod_distance=None, skirt_depth=None, lookahead=2.0, max_chunks=None, uploads_per_frame=2,
+                 workers=2, executor=None, uv_size=2000, chunk_kwargs=None, cache_dir=None,
+                 terrain_params=None, **kwargs):
+        """
+        Parameters:
+            height_func (callable): Vectorized terrain height, height_func(x, z) -> y, defined everywhere.
+            focus (Entity): Entity the terrain follows, e.g. the player.
+            chunk_size (float): Chunk edge length.
+            resolution (int): Quads per chunk edge at the finest level.
+            levels (int): Number of detail levels; each halves the resolution of the previous one.
+            view_distance (float): Chunks whose center is within this distance are loaded.
+            lod_distance (float, optional): Distance up to which chunks use the finest level;
+                each further level starts at twice the distance. Defaults to 1.5 chunk sizes.
+            skirt_depth (float, optional): Skirt length; defaults to one coarsest-level cell.
+            lookahead (float): Seconds of the focus's current velocity to load ahead by.
+            max_chunks (int, optional): Loaded chunks kept at most. Defaults to 1.5 views' worth.
+            uploads_per_frame (int): Finished chunks turned into meshes per frame at most.
+            workers (int): Worker threads, when no executor is given.
+            executor (Executor, optional): Pool to generate chunks on. A ProcessPoolExecutor
+                works too if height_func can be pickled.
+            uv_size (float): Distance over which the UVs run from 0 to 1.
+            chunk_kwargs (dict, optional): Extra Entity arguments for every chunk (texture, shader, ...).
+            cache_dir (str, optional): Directory to cache chunk mesh buffers in (see terrain_cache.py).
+            terrain_params (dict, optional): Parameters identifying the terrain `height_func` samples,
+                e.g. Heightfield.params. Chunk meshes are only cached when this is given.
+        """
+        super().__init__(**kwargs)
+        self.height_func = height_func
+        self.focus = focus
+        self.chunk_size = chunk_size
+        self.resolution = resolution
+        self.levels = levels
+        self.view_distance = view_distance
+        self.lod_distance = lod_distance or 1.5 * chunk_size
+        self.skirt_depth = skirt_depth or chunk_size / max(resolution >> (levels - 1), 1)
+        self.lookahead = lookahead
+        self.uploads_per_frame = uploads_per_frame
+        self.uv_size = uv_size
+        self.chunk_kwargs = chunk_kwargs or {}
+        self.cache_dir = cache_dir if terrain_params is not None else None
+        self.terrain_params = terrain_params
+
+        # Chunk offsets within view, relative to the chunk holding the view center
+        reach = int(math.ceil(view_distance / chunk_size))
+        ox, oz = np.meshgrid(np.arange(-reach, reach + 1), np.arange(-reach, reach + 1), indexing='ij')
+        offsets = np.column_stack((ox.ravel(), oz.ravel()))
+        self.offsets = offsets[np.hypot(*(offsets.T * chunk_size)) <= view_distance + chunk_size]
+        self.max_chunks = max_chunks or int(1.5 * len(self.offsets))
+
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix='terrain')
+        self.max_pending = 2 * workers
+        self.loaded = OrderedDict()  # (ix, iz) -> [level, chunk Entity], least recently wanted first
+        self.pending = {}  # (ix, iz) -> (level, Future)
+        self.queue = []  # (ix, iz, level) still to submit, most urgent last
+        self.wanted = {}  # (ix, iz) -> level, for the current view
+        self.view_cell = None
+        self.velocity = np.zeros(2)
+        self.last_position = None
+
+        self.prime()
+
+    def chunk_origin(self, ix, iz):
+        return ix * self.chunk_size, iz * self.chunk_size
+
+    def chunk_params(self, ix, iz, resolution):
+        x0, z0 = self.chunk_origin(ix, iz)
+        return {'mesh': MESH_VERSION, 'terrain': self.terrain_params, 'x0': x0, 'z0': z0,
+                'size': self.chunk_size, 'resolution': resolution, 'world_size': self.uv_size,
+                'skirt_depth': self.skirt_depth}
+
+    def level_for(self, ix, iz, x, z):
+        """Detail level of chunk (ix, iz) for a focus at (x, z)."""
+        d = math.hypot((ix + .5) * self.chunk_size - x, (iz + .5) * self.chunk_size - z)
+        level = math.floor(math.log2(max(d, 1e-6) / self.lod_distance)) + 1
+        return min(max(level, 0), self.levels - 1)
+
+    def prime(self):
+        """
+        Generates the chunks near the focus on the spot, so the first frames are not empty.
+        """
+        x, z = self.focus.x, self.focus.z
+        cx, cz = math.floor(x / self.chunk_size), math.floor(z / self.chunk_size)
+        for ix in range(cx - 1, cx + 2):
+            for iz in range(cz - 1, cz + 2):
+                level = self.level_for(ix, iz, x, z)
+                self.place_chunk((ix, iz), level, generate_chunk(*self.job(ix, iz, level)))
+
+    def job(self, ix, iz, level):
+        """Arguments of generate_chunk for chunk (ix, iz) at `level`."""
+        resolution = max(self.resolution >> level, 1)
+        x0, z0 = self.chunk_origin(ix, iz)
+        params = self.chunk_params(ix, iz, resolution) if self.cache_dir else None
+        return (self.height_func, x0, z0, self.chunk_size, resolution, self.uv_size, self.skirt_depth,
+                self.cache_dir, params)
+
+    def plan(self, x, z, ahead_x, ahead_z):
+        """
+        Recomputes the wanted chunks and their levels for a focus at (x, z) heading for
+        (ahead_x, ahead_z), and queues the ones missing or at the wrong level.
+        """
+        cx, cz = math.floor(ahead_x / self.chunk_size), math.floor(ahead_z / self.chunk_size)
+        cells = self.offsets + (cx, cz)
+        centers = (cells + .5) * self.chunk_size
+        order = np.argsort(-np.hypot(centers[:, 0] - ahead_x, centers[:, 1] - ahead_z))  # Farthest first
+
+        self.wanted = {}
+        self.queue = []
+        for ix, iz in cells[order].tolist():
+            key = (ix, iz)
+            level = self.level_for(ix, iz, x, z)
+            self.wanted[key] = level
+            if key in self.loaded:
+                self.loaded.move_to_end(key)
+                if self.loaded[key][0] == level:
+                    continue
+            if key in self.pending and self.pending[key][0] == level:
+                continue
+            self.queue.append((ix, iz, level))
+
+        # Work for chunks that left the view is dropped if it has not started yet
+        for key in [key for key, (level, _) in self.pending.items() if self.wanted.get(key) != level]:
+            if self.pending[key][1].cancel():
+                del self.pending[key]
+
+    def submit(self):
+        while self.queue and len(self.pending) < self.max_pending:
+            ix, iz, level = self.queue.pop()
+            self.pending[(ix, iz)] = (level, self.executor.submit(generate_chunk, *self.job(ix, iz, level)))
+
+    def collect(self):
+        """Turns finished chunks into meshes, at most uploads_per_frame of them, without waiting."""
+        uploads = 0
+        for key in [key for key, (_, future) in self.pending.items() if future.done()]:
+            if uploads >= self.uploads_per_frame:
+                break
+            level, future = self.pending.pop(key)
+            if self.wanted.get(key) != level:
+                continue  # Left the view or changed level while generating
+            error = future.exception()
+            if error is not None:
+                # Generation errors must not reach the render thread; retry after the other work
+                warnings.warn(f"terrain chunk {key} failed to generate: {error!r}", RuntimeWarning)
+                self.queue.insert(0, (*key, level))
+                continue
+            self.place_chunk(key, level, future.result())
+            uploads += 1
+
+    def place_chunk(self, key, level, arrays):
+        vertices, triangles, uvs, normals = arrays
+        mesh = build_geom_node(vertices, triangles, normals, uvs, name=f'terrain_chunk_{key[0]}_{key[1]}')
+        if key in self.loaded:
+            entry = self.loaded[key]
+            entry[1].model = mesh
+            if 'texture_scale' in self.chunk_kwargs:
+                entry[1].texture_scale = self.chunk_kwargs['texture_scale']
+            entry[0] = level
+        else:
+            self.loaded[key] = [level, Entity(parent=self, model=mesh, **self.chunk_kwargs)]
+        self.loaded.move_to_end(key)
+
+    def evict(self):
+        while len(self.loaded) > self.max_chunks:
+            key, (_, chunk) = next(iter(self.loaded.items()))
+            if key in self.wanted:
+                break  # Everything older is still in view: the budget is smaller than the view
+            del self.loaded[key]
+            destroy(chunk)
+
+    def update(self):
+        x, z = self.focus.x, self.focus.z
+        if self.last_position is not None and time.dt > 0:
+            moved = np.array((x - self.last_position[0], z - self.last_position[1])) / time.dt
+            self.velocity += (moved - self.velocity) * min(time.dt * 4, 1)  # Smoothed over ~.25 s
+        self.last_position = (x, z)
+
+        ahead = self.velocity * self.lookahead
+        reach = np.hypot(*ahead)
+        if reach > self.view_distance / 2:
+            ahead *= self.view_distance / 2 / reach
+        ahead_x, ahead_z = x + ahead[0], z + ahead[1]
+        cell = (math.floor(ahead_x / self.chunk_size), math.floor(ahead_z / self.chunk_size),
+                math.floor(x / self.chunk_size), math.floor(z / self.chunk_size))
+        if cell != self.view_cell:
+            self.view_cell = cell
+            self.plan(x, z, ahead_x, ahead_z)
+
+        self.collect()
+        self.submit()
+        self.evict()
+
+    def on_destroy(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,77 +1,130 @@
+import os
+import sys
 import json
 import numpy as np
 from ursina import *
-from ursina.prefabs.first_person_controller import FirstPersonController
 from ursina.shaders import lit_with_shadows_shader
 from Shaders.shaders import sky_shader, water_shader, underwater_shader, hologram  # Assuming this is defined elsewhere
 from sim_init import *
+from snapshot import save_snapshot, load_snapshot
+from recorder import TrajectoryReader, TrajectoryPlayer
+from instance_buffer import InstanceBuffer
+from terrain_chunks import ChunkedTerrain
+from terrain_stream import StreamingTerrain
+from terrain import Heightfield
+from heightfield_controller import HeightfieldController
+from sim_clock import SimClock
 
 class Oasis:
-    def __init__(self, terrain_subdivisions=10, world_size=2000, height_scale=80, game_start_time=42000):
-
-        # Load species data
-        with open("species_config.json", "r") as f:
-            config = json.load(f)
-
-        config = generate_species_grid(config)  # Auto-generate species if missing
+    def __init__(self, world_size=2000, height_scale=80, game_start_time=42000,
+                 snapshot_path='oasis.snap', replay_path=None, cache_dir='terrain_cache',
+                 endless=False, sim_step=0.1, max_sim_steps=4):
 
         # Predefine variables
-        self.terrain_subdivisions = terrain_subdivisions
         self.world_size = world_size
+        self.endless = endless
         self.height_scale = height_scale
-        self.terrain_heights = np.zeros((world_size, world_size))  # Placeholder for actual heightmap data
+        # One terrain sampler shared by the renderer, EcoSim, spawning and collision
+        self.heightfield = Heightfield.analytic(world_size, height_scale, cache_dir=cache_dir)
+        self.terrain_heights = self.heightfield.heights
         self.game_start_time = game_start_time
 
         self.HOLOGRAM_RADIUS = 100
-        max_entities = 10000  # or whatever maximum you expect
-
-        self.entity_positions = np.zeros((max_entities, 3), dtype=np.float32)
-        self.entity_model_types = np.zeros((max_entities,), dtype=np.int32)
-        self.entity_colors = np.zeros((max_entities, 3), dtype=np.float32)
-
-        self.species_array, self.categorical_mappings, self.model_data = convert_species_config_with_categorical(config)
-        # Initialize EcoSim with the real terrain height function
-        self.eco_sim = EcoSim(self.get_terrain_height, self.species_array)
-
-        self.time_scale = 1
+        max_entities = 100000  # or whatever maximum you expect
+
+        # Per-instance hologram data, laid out as the hologram shader reads it; the arrays
+        # below are views into it, so filling them fills the upload buffer
+        self.instances = InstanceBuffer(max_entities, texels=2)
+        self.entity_positions = self.instances.data[:, 0:3]
+        self.entity_model_types = self.instances.data[:, 3]
+        self.entity_colors = self.instances.data[:, 4:7]
+        self.instances.data[:, 7] = 1.0  # Scale
+
+        # Replay mode plays a recorded run (see recorder.py) instead of stepping EcoSim
+        self.replay = TrajectoryPlayer(TrajectoryReader(replay_path)) if replay_path else None
+        self.visible_count = 0
+
+        # Resume from a snapshot if one exists (F5 writes it); otherwise build from the species config
+        self.snapshot_path = snapshot_path
+        if self.replay is not None:
+            self.eco_sim = None
+            self.categorical_mappings, self.model_data = {}, {}
+        elif snapshot_path and os.path.exists(snapshot_path):
+            self.eco_sim, self.categorical_mappings, header = load_snapshot(snapshot_path, self.heightfield.height)
+            self.model_data = header['extra'].get('model_data', {})
+            if header['game_time'] is not None:
+                self.game_start_time = header['game_time']
+        else:
+            with open("species_config.json", "r") as f:
+                config = json.load(f)
+
+            config = generate_species_grid(config)  # Auto-generate species if missing
+            self.species_array, self.categorical_mappings, self.model_data = convert_species_config_with_categorical(config)
+            # Initialize EcoSim with the real terrain height function
+            self.eco_sim = EcoSim(self.heightfield.height, self.species_array)
+
+        # Fixed-step simulation time: EcoSim always steps by sim_step, at most max_sim_steps per frame
+        self.clock = SimClock(step=sim_step, max_steps=max_sim_steps, start_time=self.game_start_time)
+        self.previous_positions = None  # Entity positions before the last step, for interpolation
+        self.summary_interval = 120  # Simulation seconds between printed summaries
+        self.next_summary_time = self.clock.time + self.summary_interval
         self.temp_val = 0
         self.normal_speed = 5
         self.sprint_speed = 20
 
         # Create player
-        self.player = FirstPersonController(model=Cone(), collider='capsule')
+        self.player = HeightfieldController(model=Cone(), collider='capsule')
         self.player.cursor.model = None
         self.player.shader = lit_with_shadows_shader
         self.player.position = Vec3(400, 30, 0)
         self.player.speed = self.normal_speed
+        self.player.ground = self.heightfield  # The player stands on the heightfield; terrain has no collider
 
-        # Precompute terrain heights
-        self.terrain_heights = self.precompute_terrain_heights()
-
-        # Create terrain
-        self.ground = Entity(
-            model=self.generate_terrain(),
-            collider='mesh',
+        # Create terrain: chunks around the player are finely meshed, distant ones coarsely.
+        # Endless mode streams chunks in around the player instead; off the heightmap the
+        # heightfield falls back to the formula, so the terrain goes on forever
+        chunk_kwargs = dict(
             texture='grass',
             double_sided=True,
             texture_scale=(10, 10),
             shadows=True,
             shader=lit_with_shadows_shader
         )
-
-        # Create hologram quad for entity visualization
+        if endless:
+            self.ground = StreamingTerrain(
+                self.heightfield.height,
+                self.player,
+                uv_size=self.world_size,
+                cache_dir=cache_dir,
+                terrain_params=self.heightfield.params,
+                chunk_kwargs=chunk_kwargs
+            )
+        else:
+            self.ground = ChunkedTerrain(
+                self.heightfield.height,
+                self.world_size,
+                focus=self.player,
+                collider_levels=0,
+                cache_dir=cache_dir,
+                terrain_params=self.heightfield.params,
+                chunk_kwargs=chunk_kwargs
+            )
+
+        # Hologram entities: one instanced draw of a small mesh, placed per entity by the shader
         self.hologram_shader = Entity(
-            model='quad',
-            position=(0, 0, 1),
-            scale=(2, 2),  # Fullscreen overlay
-            parent=camera.ui,
+            model='sphere',
             shader=hologram,  # The new shader to visualize entities
             enabled=True
         )
+        self.hologram_shader.set_transparency(True)
+        self.instances.attach(self.hologram_shader)
 
         # Determine dynamic water level
-        min_height = np.min(self.terrain_heights)
+        min_height = self.min_height = float(np.min(self.terrain_heights))
         self.water_level = min_height + (self.height_scale * 3 / 4)  # Adjust as needed
+        if self.eco_sim is not None:
+            self.eco_sim.water_level = self.water_level
+            self.build_render_luts()
         # Create terrain
         self.water = Entity(
             model='plane',
@@ -143,83 +196,13 @@ class Oasis:
         #     shader=lit_with_shadows_shader
         # )
 
-    def precompute_terrain_heights(self):
-        x = np.arange(-self.world_size // 2, self.world_size // 2)
-        X, Z = np.meshgrid(x, x)
-        height1 = np.sin(X * 0.01) * np.cos(Z * 0.01) * self.height_scale
-        height2 = np.sin(X * 0.03 + 1.0) * np.cos(Z * 0.03 + 2.0) * self.height_scale * 0.3
-        return height1 + height2
-
-    def generate_terrain(self):
-        size = self.world_size
-        subdivisions = 20
-        height_scale = self.height_scale
-
-        # Create grid coordinates
-        x = np.linspace(-size / 2, size / 2, self.terrain_subdivisions + 1)
-        z = np.linspace(-size / 2, size / 2, self.terrain_subdivisions + 1)
-        X, Z = np.meshgrid(x, z)
-
-        # Calculate heights
-        height1 = np.sin(X * 0.01) * np.cos(Z * 0.01) * height_scale
-        height2 = np.sin(X * 0.03 + 1.0) * np.cos(Z * 0.03 + 2.0) * height_scale * 0.3
-        Y = height1 + height2
-
-        # Create vertices array
-        vertices = np.column_stack((X.ravel(), Y.ravel(), Z.ravel()))
-
-        # Generate UV coordinates
-        uvs = np.column_stack((
-            np.linspace(0, 1, self.terrain_subdivisions + 1).repeat(self.terrain_subdivisions + 1),
-            np.tile(np.linspace(0, 1, self.terrain_subdivisions + 1), self.terrain_subdivisions + 1)
-        ))
-
-        # Vectorized triangle indices generation
-        idx = np.arange((self.terrain_subdivisions + 1) * (self.terrain_subdivisions + 1)).reshape(self.terrain_subdivisions + 1, self.terrain_subdivisions + 1)
-        triangles = np.vstack((
-            np.column_stack([idx[:-1, :-1].ravel(), idx[1:, :-1].ravel(), idx[:-1, 1:].ravel()]),
-            np.column_stack([idx[1:, :-1].ravel(), idx[1:, 1:].ravel(), idx[:-1, 1:].ravel()])
-        ))
-
-        # Calculate normals
-        v1 = vertices[triangles[:, 1]] - vertices[triangles[:, 0]]
-        v2 = vertices[triangles[:, 2]] - vertices[triangles[:, 0]]
-        face_normals = np.cross(v1, v2)
-        face_normals /= np.linalg.norm(face_normals, axis=1)[:, np.newaxis] + 1e-10
-
-        normals = np.zeros_like(vertices)
-        np.add.at(normals, triangles[:, 0], face_normals)
-        np.add.at(normals, triangles[:, 1], face_normals)
-        np.add.at(normals, triangles[:, 2], face_normals)
-        normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis] + 1e-10
-
-        # Return the terrain mesh
-        return Mesh(
-            vertices=vertices.tolist(),
-            triangles=triangles.tolist(),
-            uvs=uvs.tolist(),
-            normals=normals.tolist(),
-            mode='triangle'
-        )
-
-    def get_terrain_height(self, x, z):
-        idx = (x + self.world_size // 2).astype(int)
-        idz = (z + self.world_size // 2).astype(int)
-
-        if np.all((0 <= idx) & (idx < self.world_size) & (0 <= idz) & (idz < self.world_size)):
-            return self.terrain_heights[idx, idz]
-
-        height1 = np.sin(x * 0.01) * np.cos(z * 0.01) * self.height_scale
-        height2 = np.sin(x * 0.03 + 1.0) * np.cos(z * 0.03 + 2.0) * self.height_scale * 0.3
-        return height1 + height2
+    @property
+    def time_scale(self):
+        return self.clock.time_scale
 
-    def smooth_slope_climbing(self):
-        # Raycast down from the player's position to find the terrain's surface
-        raycast_distance = 3  # Adjust this value as needed
-        ray = raycast(self.player.world_position + Vec3(0, 1, 0), Vec3(0, -1, 0), distance=raycast_distance, ignore=[self.player, ])  # Added ignore=[self.player] to prevent self-collision
-        if ray.hit:
-            # If the ray hits the terrain, adjust the player's y position
-            self.player.y = ray.world_point.y
+    @time_scale.setter
+    def time_scale(self, value):
+        self.clock.time_scale = value
 
     def calculate_underwater_color(self):
         """Scales RGB values based on depth to simulate underwater light absorption."""
@@ -241,6 +224,62 @@ class Oasis:
         depth_alpha = min(1.0, max(0.0, rel_depth / max_depth))  # Since max_depth = 200
         return depth_alpha, r_depth, g_depth, b_depth
 
+    def build_render_luts(self):
+        """
+        Per-species model type and color tables, so packing reads only the hot 'species'
+        column. Species share their looks, so the first row of each species stands for it.
+        """
+        e = self.eco_sim.entities
+        species, first = np.unique(e['species'], return_index=True)
+        size = int(species.max()) + 1 if len(species) else 1
+        self.species_model_types = np.zeros(size, dtype=np.float32)
+        self.species_colors = np.ones((size, 3), dtype=np.float32)
+        self.species_model_types[species] = e['model_type'][first]
+        self.species_colors[species] = e['color'][first]
+
+    def pack_visible(self, x, y, z, alive):
+        """
+        Selects living entities within HOLOGRAM_RADIUS of the player and writes their
+        positions into the instance buffer.
+
+        Returns:
+            np.ndarray: Indices of the packed entities, in buffer order.
+        """
+        px, py, pz = self.player.position
+        dx, dy, dz = x - px, y - py, z - pz
+        near = alive & (dx * dx + dy * dy + dz * dz < self.HOLOGRAM_RADIUS ** 2)
+        idx = np.flatnonzero(near)[:len(self.entity_positions)]
+        count = len(idx)
+        self.entity_positions[:count, 0] = x[idx]
+        self.entity_positions[:count, 1] = y[idx]
+        self.entity_positions[:count, 2] = z[idx]
+        self.visible_count = count
+        return idx
+
+    def blend_positions(self, idx):
+        """
+        Moves the packed entities from their latest simulated positions back toward the ones
+        before the last step, by the clock's alpha, so motion is smooth between steps.
+        """
+        prev = self.previous_positions
+        if prev is None or prev.shape[1] != len(self.eco_sim.entities):
+            return
+        count = len(idx)
+        current = self.entity_positions[:count]
+        current += (prev[:, idx].T - current) * (1.0 - self.clock.alpha)
+
+    def load_replay_frame(self, frame):
+        """
+        Streams one recorded frame into the hologram buffers, read straight from the
+        memory-mapped recording.
+        """
+        n = int(frame['count'])
+        idx = self.pack_visible(frame['x'][:n], frame['y'][:n], frame['z'][:n], frame['alive'][:n])
+        count = len(idx)
+        fields = self.replay.reader.fields
+        self.entity_colors[:count] = frame['color'][idx] if 'color' in fields else 1.0
+        self.entity_model_types[:count] = frame['model_type'][idx] if 'model_type' in fields else 0
+
     def input(self, key):
         if key == 'p':
             self.time_scale = 0
@@ -261,6 +300,15 @@ class Oasis:
             self.water.y += 1
         elif key == '-':
             self.water.y -= 1
+        elif key == 'r' and self.replay is not None:
+            self.replay.reverse()
+        elif key == 'home' and self.replay is not None:
+            self.replay.seek_time(self.replay.start_time)
+        elif key == 'end' and self.replay is not None:
+            self.replay.seek_time(self.replay.end_time)
+        elif key == 'f5' and self.snapshot_path and self.eco_sim is not None:
+            save_snapshot(self.snapshot_path, self.eco_sim, self.categorical_mappings,
+                          game_time=self.clock.time, extra={'model_data': self.model_data})
         elif key == 'escape':
             application.quit()
         if held_keys['shift']:
@@ -271,8 +319,10 @@ class Oasis:
     def update(self):
         global entity_positions
 
-        self.time_scale_text.text = f'Time Scale: {self.time_scale:.1f}'
-        self.game_start_time += time.dt * self.time_scale
+        # Replays play at the requested scale; only the simulation is bound by the step budget
+        self.time_scale_text.text = self.clock.scale_label() if self.replay is None else f'Time Scale: {self.time_scale:.1f}'
+        steps = self.clock.advance(time.dt)
+        self.game_start_time = self.clock.render_time  # Smooth between steps, like the entities
         normalized_time = (self.game_start_time % 86400) / 86400.0
         angle_degrees = normalized_time * 360 - 90
         angle_radians = math.radians(angle_degrees)
@@ -303,8 +353,7 @@ class Oasis:
         self.sky.set_shader_input('sun_position', self.sun.position)
         self.sky.set_shader_input('time', self.game_start_time % 86400)
 
-        self.smooth_slope_climbing()
-        if self.player.y < self.terrain_heights.min():
+        if self.player.y < self.min_height:
             self.player.y = 100
 
         # set water shader
@@ -314,6 +363,8 @@ class Oasis:
 
         self.water.set_shader_input('time', self.temp_val/2)
         self.water.set_shader_input('weight', self.water_weight)
+        if self.endless:
+            self.water.x, self.water.z = self.player.x, self.player.z  # The water plane travels along
 
         if camera.world_position.y < self.water_level:  # Camera is underwater
             self.underwater_overlay.enabled = True
@@ -344,49 +395,43 @@ class Oasis:
 
         # Pass the entity data to the hologram shader
         # self.hologram_overlay.set_shader_input('entities', entities_data)
-        oasis.eco_sim.step(self.game_start_time)  # Step the simulation
-
-        if round(minutes) % 2:
-            summarize_simulation(sim, categorical_mappings)
+        if self.replay is not None:
+            frame = self.replay.advance(time.dt, self.time_scale)
+            if frame is not None:
+                self.load_replay_frame(frame)
+            self.upload_hologram()
+            return
+
+        e = self.eco_sim.entities
+        for i in range(steps):
+            if i == steps - 1:
+                self.previous_positions = np.stack((e['x'], e['y'], e['z']))
+            self.eco_sim.step(self.clock.step)
+            e = self.eco_sim.entities  # The pool may have grown
+
+        if self.clock.time >= self.next_summary_time:
+            summarize_simulation(self.eco_sim, self.categorical_mappings)
+            self.next_summary_time = self.clock.time + self.summary_interval
 
         # Collect positions, model types, and colors
-        visible_entities = [e for e in self.eco_sim.entities if
-                            distance((e['x'], e['y'], e['z']), self.player.position) < self.HOLOGRAM_RADIUS]
-
-        positions = np.array([(e['x'], e['y'], e['z']) for e in visible_entities], dtype=np.float32)
-        positions = positions.reshape(-1, 3)  # Ensures that even an empty array has shape (0,3)
-        self.entity_positions[:len(visible_entities)] = positions
-
-        model_map = {'cube': 0, 'sphere': 1, 'cone': 2, 'cylinder': 3}
-        self.entity_model_types[:len(visible_entities)] = np.array(
-            [model_map.get(e['geometry']['part1']['model'], 0) for e in visible_entities],
-            dtype=np.int32
-        )
-
-        # For positions:
-        positions = np.array([(e['x'], e['y'], e['z']) for e in visible_entities], dtype=np.float32)
-        positions = positions.reshape(-1, 3)  # Ensures an empty array has shape (0,3)
-        self.entity_positions[:len(visible_entities)] = positions
-
-        # For colors:
-        colors = np.array([getattr(color, e['geometry']['part1']['color'], color.white).rgb
-                           for e in visible_entities], dtype=np.float32)
-        colors = colors.reshape(-1, 3)  # Ensures an empty array has shape (0,3)
-        self.entity_colors[:len(visible_entities)] = colors
-
+        idx = self.pack_visible(e['x'], e['y'], e['z'], self.eco_sim.alive)
+        self.blend_positions(idx)
+        species = e['species'][idx]
+        self.entity_model_types[:len(idx)] = self.species_model_types[species]
+        self.entity_colors[:len(idx)] = self.species_colors[species]
+        self.upload_hologram()
+
+    def upload_hologram(self):
         # Send to shader
         self.hologram_shader.set_shader_input("player_position", self.player.position)
         self.hologram_shader.set_shader_input("hologram_radius", self.HOLOGRAM_RADIUS)
         self.hologram_shader.set_shader_input("time", time.time())  # For animated effects
-
-        self.hologram_shader.set_shader_input("instance_offset", self.entity_positions.tolist())
-        self.hologram_shader.set_shader_input("instance_model_type", self.entity_model_types.tolist())
-        self.hologram_shader.set_shader_input("instance_color", self.entity_colors.tolist())
+        self.instances.upload(self.visible_count)
 
 
 # Main script
 app = Ursina()
-oasis = Oasis()
+oasis = Oasis(replay_path=sys.argv[1] if len(sys.argv) > 1 else None)  # python world.py [recording]
 
 def input(key):
     oasis.input(key)
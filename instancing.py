@@ -0,0 +1,167 @@
+"""
+Instanced rendering for LivingThings.
+
+Every Tree and Animal is a small tree of Entities (trunk + foliage, body + eyes + pupils),
+each a separate draw call. With a renderer installed (LivingThing.renderer = InstancedRenderer()),
+living things keep their Entities for gameplay, transforms and colliders, but their models
+are hidden; all parts sharing a model are drawn by one instanced mesh instead, fed with the
+parts' world matrices and colors. Only parts marked dirty (touch(), called by LivingThing.redraw
+whenever a living thing moves or grows) are copied, so things that stand still cost nothing.
+Disabled living things (e.g. culled by distance) are not drawn: hide() drops their rows and
+show() brings them back, called from LivingThing.on_disable / on_enable.
+"""
+
+from ursina import *
+from OasisII.instance_buffer import InstanceBuffer
+
+_TEXELS = 5  # 4 texels of world matrix rows + 1 of color
+
+instanced_shader = Shader(
+    language=Shader.GLSL,
+    vertex='''
+    #version 330 core
+    uniform mat4 p3d_ModelViewProjectionMatrix;
+    uniform samplerBuffer instance_data;
+    in vec4 p3d_Vertex;
+    in vec3 p3d_Normal;
+    out vec3 world_normal;
+    out vec4 instance_color;
+
+    void main() {
+        int base = gl_InstanceID * 5;
+        // Panda3D matrices are row-vector, so the rows become the columns here
+        mat4 world = mat4(texelFetch(instance_data, base),
+                          texelFetch(instance_data, base + 1),
+                          texelFetch(instance_data, base + 2),
+                          texelFetch(instance_data, base + 3));
+        instance_color = texelFetch(instance_data, base + 4);
+        world_normal = normalize(mat3(world) * p3d_Normal);
+        gl_Position = p3d_ModelViewProjectionMatrix * (world * p3d_Vertex);
+    }
+    ''',
+    fragment='''
+    #version 330 core
+    in vec3 world_normal;
+    in vec4 instance_color;
+    out vec4 fragColor;
+    uniform vec3 light_direction;
+
+    void main() {
+        float diffuse = max(dot(normalize(world_normal), -normalize(light_direction)), 0.0);
+        fragColor = vec4(instance_color.rgb * (0.35 + 0.65 * diffuse), instance_color.a);
+    }
+    ''',
+    default_input={'light_direction': Vec3(-1, -2, -1)},
+)
+
+
+class _Batch:
+    """
+    All parts drawn with one model: an instanced Entity and the part Entities it stands in for.
+    """
+
+    def __init__(self, model, capacity):
+        self.entity = Entity(model=model, shader=instanced_shader)
+        self.parts = []  # Instance row -> part
+        self.rows = {}  # Part -> instance row
+        self.dirty = set()  # Parts whose row is out of date
+        self.uploaded = 0  # Rows drawn since the last upload
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.buffer = InstanceBuffer(capacity, texels=_TEXELS)
+        self.matrices = self.buffer.data[:, :16].reshape(capacity, 4, 4)
+        self.colors = self.buffer.data[:, 16:20]
+        self.buffer.attach(self.entity)
+        self.dirty.update(self.parts)
+
+    def add(self, part):
+        self.rows[part] = len(self.parts)
+        self.parts.append(part)
+        self.dirty.add(part)
+
+    def remove(self, part):
+        """Drops `part`, moving the last row into its place so rows stay packed."""
+        row = self.rows.pop(part, None)
+        if row is None:
+            return
+        self.dirty.discard(part)
+        last = self.parts.pop()
+        if last is not part:
+            self.parts[row] = last
+            self.rows[last] = row
+            self.dirty.add(last)
+
+    def update(self):
+        n = len(self.parts)
+        if n > self.buffer.capacity:
+            self._allocate(max(n, 2 * self.buffer.capacity))
+        if not self.dirty and n == self.uploaded:
+            return
+        for part in self.dirty:
+            row = self.rows[part]
+            self.matrices[row] = part.model.get_mat(render)
+            self.colors[row] = part.color
+        self.dirty.clear()
+        self.buffer.upload(n)
+        self.uploaded = n
+
+
+class InstancedRenderer(Entity):
+    """
+    Draws registered living things through one instanced mesh per model.
+    """
+
+    def __init__(self, capacity=4096, **kwargs):
+        """
+        Parameters:
+            capacity (int): Initial instances per model; batches grow as needed.
+        """
+        super().__init__(**kwargs)
+        self.capacity = capacity
+        self.batches = {}
+        self.members = {}  # Living thing -> its drawn parts
+
+    def add(self, thing):
+        """
+        Hides the models of `thing` and its descendants and draws them instanced.
+        """
+        drawn = []
+        stack = [thing]
+        while stack:
+            part = stack.pop()
+            stack.extend(child for child in part.children if isinstance(child, Entity))
+            if not part.model:
+                continue
+            name = part.model.name
+            if name not in self.batches:
+                self.batches[name] = _Batch(name, self.capacity)
+            if thing.enabled:
+                self.batches[name].add(part)
+            part.model.hide()
+            drawn.append((self.batches[name], part))
+        self.members[thing] = drawn
+
+    def remove(self, thing):
+        """Stops drawing `thing`; call before destroying it."""
+        for batch, part in self.members.pop(thing, ()):
+            batch.remove(part)
+
+    def hide(self, thing):
+        """Stops drawing `thing` until show(), keeping it registered."""
+        for batch, part in self.members.get(thing, ()):
+            batch.remove(part)
+
+    def show(self, thing):
+        for batch, part in self.members.get(thing, ()):
+            if part not in batch.rows:
+                batch.add(part)
+
+    def touch(self, thing):
+        """Marks the parts of `thing` for copying on the next update, after it moved or changed."""
+        for batch, part in self.members.get(thing, ()):
+            batch.dirty.add(part)
+
+    def update(self):
+        for batch in self.batches.values():
+            batch.update()
@@ -0,0 +1,405 @@
+"""
+Batched simulation of LivingThings.
+
+A LivingBatch gathers the state that Tree and Animal update one entity at a time (lifespan,
+sleep timers, heading, position) into NumPy arrays, advances all of them together one fixed
+step at a time with the same rules, and scatters the result back onto the Entities when
+asked. Growth is a closed-form function of simulation time, so it is not stepped at all; the
+entities re-evaluate it when scattered. Stepping costs a handful of array operations no
+matter how many living things there are, so it can run hundreds of steps per frame.
+
+A LivingSystem keeps every living thing in one LivingBatch for good: Ursina no longer calls
+their update(), the system steps the batch on the shared clock once per frame, and only the
+things near the focus get their transforms written back (see main2_full.py).
+
+Differences from the per-entity rules: animals use the full step instead of capping it at
+Animal.MAX_ALLOWED_DT, stop on their target instead of overshooting it, and do not consult
+the occupancy grid while moving; they only take their cells in it when the batch is synced.
+"""
+
+import time as wall_time
+import numpy as np
+from ursina import Entity, Vec3
+from LivingThings import LivingThing, Animal
+
+# name: (trailing shape, dtype)
+_COLUMNS = {
+    'alive': ((), bool),
+    'animal': ((), bool),
+    'lifespan': ((), np.float64),
+    'age': ((), np.float64),
+    'position': ((2,), np.float64),  # x, z
+    'rotation': ((), np.float64),  # rotation_y in degrees
+    'target': ((2,), np.float64),
+    'speed': ((), np.float64),
+    'rotation_range': ((2,), np.float64),
+    'moving': ((), bool),
+    'sleeping': ((), bool),
+    'sleep_left': ((), np.float64),
+    'awake_left': ((), np.float64),
+    'y': ((), np.float64),  # Height the entity was last placed at
+    'look': ((2,), np.float64),  # Eye look target x, z (at y=1)
+    'eye_rotation': ((2,), np.float64),  # Eye rotation_x, rotation_y in degrees
+    'shown': ((), bool),  # Whether the entity is enabled
+    'handle': ((), np.int64),  # Handle in LivingThing.occupancy
+    'cell': ((2,), np.int64),  # Occupancy cell last taken
+}
+
+
+def _gather(thing):
+    """One row of column values from a living thing."""
+    animal = isinstance(thing, Animal)
+    target = thing.target if animal and thing.target else thing.position
+    look = thing.look_target if animal and thing.look_target else thing.position
+    eye = thing.eyes[0] if animal else None
+    return {
+        'alive': True,
+        'animal': animal,
+        'lifespan': thing.lifespan,
+        'age': thing.age,
+        'position': (thing.x, thing.z),
+        'rotation': thing.rotation_y,
+        'target': (target.x, target.z),
+        'speed': thing.speed if animal else 0.0,
+        'rotation_range': thing.rotation_speed_range if animal else (0.0, 0.0),
+        'moving': animal and thing.moving,
+        'sleeping': animal and thing.sleeping,
+        'sleep_left': thing.sleep_time_left if animal else 0.0,
+        'awake_left': thing.awake_time_left if animal else 0.0,
+        'y': thing.y,
+        'look': (look.x, look.z),
+        'eye_rotation': (eye.rotation_x, eye.rotation_y) if animal else (0.0, 0.0),
+        'shown': thing.enabled,
+        'handle': thing.handle,
+        'cell': thing.cell,
+    }
+
+
+class LivingBatch:
+    """
+    Array-backed state of a set of living things, stepped all at once.
+    """
+
+    def __init__(self, things=(), rng=None):
+        """
+        Parameters:
+            things (iterable): Trees and Animals to take over.
+            rng (np.random.Generator, optional): Source of new wander targets.
+        """
+        self.rng = rng or np.random.default_rng()
+        self.things = []
+        for name, (shape, dtype) in _COLUMNS.items():
+            setattr(self, name, np.zeros((0,) + shape, dtype=dtype))
+        self.add(things)
+
+    def __len__(self):
+        return len(self.things)
+
+    def add(self, things):
+        """Takes over living things: their own update() stops running until release()."""
+        things = [thing for thing in things if not thing.destroyed]
+        if not things:
+            return
+        for thing in things:
+            thing.batched = True
+            thing.ignore = True
+            thing.cancel_events()  # The batch keeps the time of deaths and flips
+        rows = [_gather(thing) for thing in things]
+        for name, (shape, dtype) in _COLUMNS.items():
+            column = np.array([row[name] for row in rows], dtype=dtype).reshape((len(rows),) + shape)
+            setattr(self, name, np.concatenate((getattr(self, name), column)))
+        self.things.extend(things)
+
+    def step(self, dt):
+        """Advances every living thing in the batch by `dt` simulation seconds."""
+        live = self.alive
+        self.lifespan[live] -= dt
+        self.age[live] += dt
+        self.alive &= self.lifespan > 0
+
+        animals = self.alive & self.animal
+        asleep = animals & self.sleeping
+        awake = animals & ~self.sleeping
+        self.sleep_left[asleep] -= dt
+        woken = asleep & (self.sleep_left <= 0)
+        self.sleeping[woken] = False
+        self.awake_left[woken] = Animal.AWAKE_TIME
+
+        self.move(np.flatnonzero(awake), dt)
+        self.look_around(np.flatnonzero(awake), dt)
+        self.awake_left[awake] -= dt
+        tired = awake & (self.awake_left <= 0)
+        self.sleeping[tired] = True
+        self.sleep_left[tired] = Animal.SLEEP_TIME
+
+    def new_targets(self, count):
+        return self.rng.uniform(*Animal.SAFE_ZONE, size=(count, 2))
+
+    def move(self, idx, dt):
+        """Turns animals `idx` toward their targets, and walks the ones facing it."""
+        offset = self.target[idx] - self.position[idx]
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        arrived = distance < 0.001
+        self.target[idx[arrived]] = self.new_targets(int(arrived.sum()))
+        self.moving[idx[arrived]] = False
+        going = ~arrived
+        idx, offset, distance = idx[going], offset[going], distance[going]
+
+        target_angle = np.degrees(np.arctan2(offset[:, 0], offset[:, 1]))
+        angle_diff = (target_angle - self.rotation[idx] + 180) % 360 - 180
+        lifespan = self.lifespan[idx]
+        life = np.where(lifespan > 0, np.clip(self.age[idx] / np.where(lifespan > 0, lifespan, 1), 0, 1), 1)
+        low, high = self.rotation_range[idx, 0], self.rotation_range[idx, 1]
+        max_rotation = (low + (high - low) * life) * dt
+
+        turning = np.abs(angle_diff) > 5
+        turn = idx[turning]
+        self.rotation[turn] = (self.rotation[turn] + np.clip(angle_diff[turning], -max_rotation[turning],
+                                                             max_rotation[turning])) % 360
+        self.moving[turn] = False
+
+        walk = idx[~turning]
+        stride = self.speed[walk] * dt
+        reach = stride >= distance[~turning]
+        heading = np.radians(self.rotation[walk])
+        step = np.column_stack((np.sin(heading), np.cos(heading))) * stride[:, np.newaxis]
+        self.position[walk] = np.where(reach[:, np.newaxis], self.target[walk], self.position[walk] + step)
+        self.moving[walk] = True
+
+        position = self.position[walk]
+        lost = np.isnan(position).any(axis=1) | (np.abs(position) > Animal.POSITION_LIMIT).any(axis=1)
+        self.position[walk[lost]] = self.new_targets(int(lost.sum()))
+
+    def look_around(self, idx, dt):
+        """Turns the eyes of animals `idx` toward their look targets, now and then picking new ones."""
+        bored = idx[self.rng.random(len(idx)) < 0.02]
+        self.look[bored] = self.new_targets(len(bored))
+        offset = self.look[idx] - self.position[idx]
+        heading = np.radians(self.rotation[idx])
+        sin, cos = np.sin(heading), np.cos(heading)
+        right = offset[:, 0] * cos - offset[:, 1] * sin
+        forward = offset[:, 0] * sin + offset[:, 1] * cos
+        up = 1.0 - self.y[idx]
+        length = np.maximum(np.sqrt(right * right + forward * forward + up * up), 1e-3)
+        limit = Animal.MAX_EYE_ANGLE
+        yaw = np.clip(np.degrees(np.arctan2(right, forward)), -limit, limit)
+        pitch = np.clip(np.degrees(np.arcsin(np.clip(up / length, -1.0, 1.0))), -limit, limit)
+        self.eye_rotation[idx] += (np.column_stack((-pitch, yaw)) - self.eye_rotation[idx]) * min(dt * 5, 1.0)
+
+    def within(self, x, z, radius):
+        """Mask of living things within `radius` of (x, z)."""
+        offset = self.position - (x, z)
+        return self.alive & (np.einsum('ij,ij->i', offset, offset) < radius * radius)
+
+    def near(self, x, z, radius):
+        """Indices of living things within `radius` of (x, z)."""
+        return np.flatnonzero(self.within(x, z, radius))
+
+    def place(self, indices, height_func=None):
+        """
+        Writes position, heading and eye rotation of animals `indices` straight to their
+        transforms, placing them at height_func(x, z) (vectorized) when one is given.
+        """
+        indices = indices[self.animal[indices]]
+        if not len(indices):
+            return
+        if height_func is not None:
+            self.y[indices] = height_func(self.position[indices, 0], self.position[indices, 1])
+        rows = zip(indices.tolist(), self.position[indices].tolist(), self.y[indices].tolist(),
+                   self.rotation[indices].tolist(), self.eye_rotation[indices].tolist())
+        for i, (x, z), y, rotation, (eye_x, eye_y) in rows:
+            thing = self.things[i]
+            thing.setPosHpr(x, y, z, -rotation, 0, 0)  # Ursina's rotation_y is a negated heading
+            for eye in thing.eyes:
+                eye.setHpr(-eye_y, -eye_x, 0)
+            thing.redraw()
+
+    def occupy(self, indices=None):
+        """Moves animals (all of them, or only `indices`) to their current cells in LivingThing.occupancy."""
+        if indices is None:
+            indices = np.flatnonzero(self.alive)
+        indices = indices[self.animal[indices]]
+        cells = LivingThing.occupancy.cells_of(self.position[indices, 0], self.position[indices, 1])
+        LivingThing.occupancy.move_many(self.handle[indices], self.cell[indices], cells)
+        self.cell[indices] = cells
+
+    def write_state(self, indices):
+        """
+        Writes the rest of the batched state of `indices` back onto the entities: growth,
+        targets, sleep and attributes, rescheduling their deaths and flips when not batched.
+        """
+        for i in indices.tolist():
+            thing = self.things[i]
+            thing.refresh()  # Lifespan, age and growth follow from the clock, which kept pace
+            thing.cell = tuple(self.cell[i].tolist())
+            thing.schedule('death', thing.death_time, LivingThing.expire)
+            if not self.animal[i]:
+                continue
+            thing.target = Vec3(self.target[i, 0], 0, self.target[i, 1])
+            thing.look_target = Vec3(self.look[i, 0], 1, self.look[i, 1])
+            thing.moving = bool(self.moving[i])
+            sleeping = bool(self.sleeping[i])
+            thing.set_sleeping(sleeping, float(self.sleep_left[i] if sleeping else self.awake_left[i]))
+            thing.update_attributes()
+
+    def scatter(self, indices=None, height_func=None):
+        """
+        Writes the batched state back onto the entities: all of them, or only `indices`.
+        Animals are placed at height_func(x, z) when one is given.
+        """
+        if indices is None:
+            indices = np.flatnonzero(self.alive)
+        self.occupy(indices)
+        self.place(indices, height_func)
+        self.write_state(indices)
+
+    def reap(self):
+        """
+        Destroys the entities of living things that died in the batch and drops their rows.
+
+        Returns:
+            list: The destroyed living things.
+        """
+        dead = np.flatnonzero(~self.alive)
+        if not len(dead):
+            return []
+        reaped = [self.things[i] for i in dead.tolist()]
+        for thing, cell in zip(reaped, self.cell[dead].tolist()):
+            thing.cell = tuple(cell)
+            thing.destroy()
+        keep = self.alive
+        for name in _COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.things = [thing for thing, kept in zip(self.things, keep.tolist()) if kept]
+        return reaped
+
+    def release(self, height_func=None):
+        """
+        Destroys what died, writes everything back and hands the living things their own
+        update() again. The batch is empty afterwards.
+        """
+        self.reap()
+        for thing in self.things:
+            thing.batched = False
+        self.scatter(height_func=height_func)
+        for thing in self.things:
+            thing.ignore = not thing.wants_update()
+        released, self.things = self.things, []
+        for name, (shape, dtype) in _COLUMNS.items():
+            setattr(self, name, np.zeros((0,) + shape, dtype=dtype))
+        return released
+
+
+class LivingSystem(Entity):
+    """
+    Updates every living thing with one call per frame instead of one update() each.
+
+    Living things hand themselves over on creation (LivingThing.join_system) and stay batched
+    for their whole life. Each frame the system runs the clock's fixed steps on the batch,
+    destroys what died, enables the things within `view_radius` of `focus` and disables the
+    rest, and writes transforms back to the visible animals only. Growth is re-evaluated when a
+    thing comes into view, and, with `growth_interval` set, for every visible thing that often.
+
+    With fast_forward set, the clock is left alone and the batch is stepped by
+    `fast_forward_step` for as long as `fast_forward_budget` wall seconds allow every frame;
+    entities are then only synced every `sync_interval` wall seconds.
+    """
+
+    def __init__(self, clock, focus, view_radius=100, height_func=None, growth_interval=None,
+                 fast_forward_step=2.0, fast_forward_budget=0.016, sync_interval=0.5, rng=None, **kwargs):
+        """
+        Parameters:
+            clock (SimClock): Clock advanced by the game loop before this system updates.
+            focus (Entity): Entity visibility is measured from, e.g. the player.
+            view_radius (float): Living things farther from the focus are disabled.
+            height_func (callable, optional): Vectorized ground height animals are placed at.
+            growth_interval (float, optional): Simulation seconds between growth refreshes of
+                all visible things. Keep it coarse: each refresh touches every visible thing.
+                By default things only grow on coming into view.
+            fast_forward_step (float): Simulation seconds per fast-forward step.
+            fast_forward_budget (float): Wall seconds of fast-forward stepping per frame.
+            sync_interval (float): Wall seconds between entity syncs while fast-forwarding.
+            rng (np.random.Generator, optional): Source of new wander targets.
+        """
+        super().__init__(**kwargs)
+        self.clock = clock
+        self.focus = focus
+        self.view_radius = view_radius
+        self.height_func = height_func
+        self.growth_interval = growth_interval
+        self.fast_forward_step = fast_forward_step
+        self.fast_forward_budget = fast_forward_budget
+        self.sync_interval = sync_interval
+        self.batch = LivingBatch(rng=rng)
+        self.incoming = []  # Living things created since the last update
+        self.fast_forward = False
+        self.simulated = 0.0  # Simulation seconds covered by the last update
+        self.last_growth = clock.time
+        self.last_sync = 0.0
+
+    def add(self, thing):
+        """Takes over a living thing; it joins the batch on the next update."""
+        thing.batched = True
+        thing.ignore = True
+        thing.cancel_events()
+        self.incoming.append(thing)
+
+    def set_fast_forward(self, on):
+        self.fast_forward = on
+        if LivingThing.renderer is not None:
+            LivingThing.renderer.ignore = on  # Instances are refreshed on sync only
+        self.last_sync = wall_time.perf_counter()
+        if not on:
+            self.sync()
+
+    def update(self):
+        if self.incoming:
+            self.batch.add(self.incoming)
+            self.incoming = []
+
+        if self.fast_forward:
+            start = wall_time.perf_counter()
+            steps = 0
+            while wall_time.perf_counter() - start < self.fast_forward_budget:
+                self.batch.step(self.fast_forward_step)
+                steps += 1
+            self.simulated = steps * self.fast_forward_step
+            self.clock.skip(self.simulated)
+            if start - self.last_sync < self.sync_interval:
+                return
+            self.last_sync = start
+        else:
+            for _ in range(self.clock.steps):
+                self.batch.step(self.clock.step)
+            self.simulated = self.clock.steps * self.clock.step
+        self.sync()
+
+    def sync(self):
+        """Destroys what died, updates visibility and writes the visible things back."""
+        batch = self.batch
+        batch.reap()
+        visible = batch.within(self.focus.x, self.focus.z, self.view_radius)
+        changed = np.flatnonzero(visible != batch.shown)
+        for i, shown in zip(changed.tolist(), visible[changed].tolist()):
+            batch.things[i].enabled = shown
+        batch.shown = visible
+
+        if self.growth_interval is not None and self.clock.time - self.last_growth >= self.growth_interval:
+            self.last_growth = self.clock.time
+            grown = np.flatnonzero(visible)
+        else:
+            grown = changed[visible[changed]]
+        for i in grown.tolist():
+            batch.things[i].refresh()
+
+        batch.occupy()
+        batch.place(np.flatnonzero(visible), self.height_func)
+        if self.fast_forward and LivingThing.renderer is not None:
+            LivingThing.renderer.update()
+
+    def on_destroy(self):
+        """Hands the living things back their own update()."""
+        if self.incoming:
+            self.batch.add(self.incoming)
+            self.incoming = []
+        self.batch.release(self.height_func)
@@ -8,18 +8,24 @@ from ursina.shaders import lit_with_shadows_shader
 # Import modular components
 from LivingThings import LivingThing, Tree, Animal
 from SkyShaders import sky_shader_full
+from instancing import InstancedRenderer
+from OasisII.sim_clock import SimClock
+from scheduler import Scheduler
+from occupancy import OccupancyGrid
 
 app = Ursina()
 
 WORLD_SIZE = 100
 
-LivingThing.entity_grid = {}
-LivingThing.time_scale = 1.0
+LivingThing.occupancy = OccupancyGrid(extent=WORLD_SIZE)  # Updated by living things as they move; never rebuilt
 LivingThing.default_shader = lit_with_shadows_shader
+LivingThing.renderer = InstancedRenderer()  # One draw call per model; set to None to draw each part separately
 
 current_time = datetime.datetime.now()
 game_time = (current_time.hour * 3600) + (current_time.minute * 60) + current_time.second
 game_start_time = game_time
+clock = LivingThing.clock = SimClock(step=1 / 60, max_steps=8, start_time=game_time)  # Living things run its fixed steps
+scheduler = LivingThing.scheduler = Scheduler(start_time=clock.time)  # Deaths and sleep/wake flips, fired on clock time
 
 player = FirstPersonController(model=Cone())
 player.cursor.model = None
@@ -54,23 +60,23 @@ sky = Sky(shader=sky_shader_full)
 sky.set_shader_input('resolution', Vec2(window.fullscreen_size[0], window.fullscreen_size[1]))
 sky.set_shader_input('sun_size', sun_scale * 0.1)
 
-time_scale_text = Text(text=f'Time Scale: {LivingThing.time_scale:.1f}', position=(0.01, -0.02), scale=0.05)
+
+time_scale_text = Text(text=f'Time Scale: {clock.time_scale:.1f}', position=(0.01, -0.02), scale=0.05)
 game_time_text = Text(text='Game Time: d:00:00:00', position=(0.01, -0.021), scale=0.05)
 
 def input(key):
-    global LivingThing
     if key == 'up arrow':
-        LivingThing.time_scale = min(LivingThing.time_scale + 0.1, 10.0)
+        clock.time_scale = min(clock.time_scale + 0.1, 10.0)
     elif key == 'down arrow':
-        LivingThing.time_scale = max(LivingThing.time_scale - 0.1, 0.1)
+        clock.time_scale = max(clock.time_scale - 0.1, 0.1)
     elif key == 'o':
-        LivingThing.time_scale += 10
+        clock.time_scale += 10
     elif key == 'p':
-        LivingThing.time_scale = max(LivingThing.time_scale - 10, 1)
+        clock.time_scale = max(clock.time_scale - 10, 1)
     elif key == 'k':
-        LivingThing.time_scale += 100
+        clock.time_scale += 100
     elif key == 'l':
-        LivingThing.time_scale += 100
+        clock.time_scale += 100
     elif key == 'escape':
         application.quit()
 
@@ -88,21 +94,15 @@ def spawn_new():
         new_predator = Animal(position=Vec3(random.uniform(-WORLD_SIZE, WORLD_SIZE), 0, random.uniform(-WORLD_SIZE, WORLD_SIZE)), animal_type='predator', shader=lit_with_shadows_shader)
         animals.append(new_predator)
 
-def update_entity_grid():
-    LivingThing.entity_grid = {k: v for k, v in LivingThing.entity_grid.items() if v[2]}
-
 def update():
     global game_start_time, sun, sun_model, sky
-    time_scale_text.text = f'Time Scale: {LivingThing.time_scale:.1f}'
+    time_scale_text.text = clock.scale_label()
     spawn_new()
-    update_entity_grid()
-
-    PHYSICS_STEP = 1 / 120
-    remaining_dt = time.dt * LivingThing.time_scale
-    while remaining_dt > 0:
-        step_dt = min(remaining_dt, PHYSICS_STEP)
-        game_start_time += step_dt
-        remaining_dt -= step_dt
+
+    # Pay out this frame's fixed steps; living things run them in their own update
+    clock.advance(time.dt)
+    scheduler.advance(clock.time)
+    game_start_time = clock.render_time
 
     total_seconds = int(game_start_time)
     days = total_seconds // 86400
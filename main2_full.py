@@ -3,106 +3,51 @@ import random
 import datetime
 import time
 from ursina import *
-from ursina.prefabs.first_person_controller import FirstPersonController
 from ursina.shaders import lit_with_shadows_shader
 
 # Import modular components
 from LivingThings import LivingThing, Tree, Animal
 from SkyShaders import sky_shader_full
+from instancing import InstancedRenderer
+from living_systems import LivingSystem
+from scheduler import Scheduler
+from occupancy import OccupancyGrid
+from OasisII.terrain import Heightfield
+from OasisII.heightfield_controller import HeightfieldController
+from OasisII.terrain_chunks import chunk_arrays
+from OasisII.mesh_builder import build_geom_node
+from OasisII.sim_clock import SimClock
 
 app = Ursina()
 
 WORLD_SIZE = 500
 height_scale = 4
 
-LivingThing.entity_grid = {}
-LivingThing.time_scale = 1.0
+LivingThing.occupancy = OccupancyGrid(extent=WORLD_SIZE)  # Updated by living things as they move; never rebuilt
 LivingThing.default_shader = lit_with_shadows_shader
+LivingThing.renderer = InstancedRenderer()  # One draw call per model; set to None to draw each part separately
 
 game_start_time = 42000  # Start time in seconds (e.g., ~11:40 AM)
+clock = LivingThing.clock = SimClock(step=1 / 60, max_steps=8, start_time=game_start_time)  # Living things run its fixed steps
+scheduler = LivingThing.scheduler = Scheduler(start_time=clock.time)  # Deaths and sleep/wake flips, fired on clock time
 last_spawn_time = time.time()  # Initialize spawn lockout timer
 
-player = FirstPersonController(model=Cone(), collider='capsule')
+player = HeightfieldController(model=Cone(), collider='capsule')
 player.cursor.model = None
 player.shader = lit_with_shadows_shader
 
-# Terrain generation function with smooth height and secondary noise
-def generate_terrain(size, subdivisions, height_scale):
-    vertices = []
-    triangles = []
-    uvs = []
-
-    # Generate vertices with two layers of height variation
-    for x in range(subdivisions + 1):
-        for z in range(subdivisions + 1):
-            pos_x = (x / subdivisions - 0.5) * size
-            pos_z = (z / subdivisions - 0.5) * size
-
-            # Primary smooth height (low frequency)
-            height1 = math.sin(pos_x * 0.01) * math.cos(pos_z * 0.01) * height_scale
-            # Secondary noise (higher frequency, phase-shifted)
-            height2 = math.sin(pos_x * 0.03 + 1.0) * math.cos(pos_z * 0.03 + 2.0) * height_scale * 0.3
-            pos_y = height1 + height2
-
-            vertices.append(Vec3(pos_x, pos_y, pos_z))
-            uvs.append(Vec2(x / subdivisions, z / subdivisions))
-
-    # Generate triangles (two per quad)
-    for x in range(subdivisions):
-        for z in range(subdivisions):
-            i = x * (subdivisions + 1) + z
-            triangles.extend([
-                i, i + subdivisions + 1, i + 1,
-                i + 1, i + subdivisions + 2, i + subdivisions + 1
-            ])
-
-    # Compute vertex normals manually
-    normals = [Vec3(0, 0, 0) for _ in vertices]
-
-    # Loop over each triangle and accumulate face normals
-    for i in range(0, len(triangles), 3):
-        i1 = triangles[i]
-        i2 = triangles[i + 1]
-        i3 = triangles[i + 2]
-
-        v1 = vertices[i1]
-        v2 = vertices[i2]
-        v3 = vertices[i3]
-
-        edge1 = v2 - v1
-        edge2 = v3 - v1
-
-        face_normal = Vec3(
-            edge1.y * edge2.z - edge1.z * edge2.y,
-            edge1.z * edge2.x - edge1.x * edge2.z,
-            edge1.x * edge2.y - edge1.y * edge2.x
-        )
-
-        mag = math.sqrt(face_normal.x**2 + face_normal.y**2 + face_normal.z**2)
-        if mag != 0:
-            face_normal = Vec3(face_normal.x/mag, face_normal.y/mag, face_normal.z/mag)
-        else:
-            face_normal = Vec3(0, 0, 0)
-
-        normals[i1] += face_normal
-        normals[i2] += face_normal
-        normals[i3] += face_normal
-
-    # Normalize all vertex normals
-    for i, n in enumerate(normals):
-        mag = math.sqrt(n.x**2 + n.y**2 + n.z**2)
-        if mag != 0:
-            normals[i] = Vec3(n.x/mag, n.y/mag, n.z/mag)
-        else:
-            normals[i] = Vec3(0, 1, 0)
-
-    terrain_mesh = Mesh(vertices=vertices, triangles=triangles, uvs=uvs, normals=normals, mode='triangle')
-    return terrain_mesh
+# Terrain heights for meshing, collision and spawning; off-grid points use the analytic formula
+heightfield = Heightfield.analytic(WORLD_SIZE, height_scale)
+
+# Terrain mesh sampled from the shared heightfield, built straight from NumPy buffers
+def generate_terrain(size, subdivisions, heightfield):
+    vertices, triangles, uvs, normals = chunk_arrays(heightfield.height, -size / 2, -size / 2, size,
+                                                     subdivisions, size, skirt_depth=0)
+    return build_geom_node(vertices, triangles, normals, uvs, name='terrain')
 
 # Create the terrain with reduced subdivisions
 ground = Entity(
-    model=generate_terrain(WORLD_SIZE, subdivisions=15, height_scale=height_scale),  # Reduced from 25 to 10
-    collider='mesh',
+    model=generate_terrain(WORLD_SIZE, subdivisions=15, heightfield=heightfield),  # Reduced from 25 to 10
     texture='grass',
     double_sided=True,
     texture_scale=(10, 10),
@@ -111,21 +56,7 @@ ground = Entity(
 
 player.position = Vec3(0, 30, 0)
 
-# Precompute terrain heights using a 2D list
-terrain_heights = [[0] * WORLD_SIZE for _ in range(WORLD_SIZE)]
-for x in range(WORLD_SIZE):
-    for z in range(WORLD_SIZE):
-        world_x = x - 250
-        world_z = z - 250
-        height1 = math.sin(world_x * 0.01) * math.cos(world_z * 0.01) * height_scale
-        height2 = math.sin(world_x * 0.03 + 1.0) * math.cos(world_z * 0.03 + 2.0) * height_scale * 0.3
-        terrain_heights[x][z] = height1 + height2
-
-def get_terrain_height(x, z, height_scale):
-    # Calculate height dynamically using the same formula as in terrain generation
-    height1 = math.sin(x * 0.01) * math.cos(z * 0.01) * height_scale
-    height2 = math.sin(x * 0.03 + 1.0) * math.cos(z * 0.03 + 2.0) * height_scale * 0.3
-    return height1 + height2
+player.ground = heightfield  # Ground collision: bilinear lookups instead of a mesh collider
 
 trees = []
 animals = []
@@ -145,30 +76,43 @@ sky = Sky(shader=sky_shader_full)
 sky.set_shader_input('resolution', Vec2(window.fullscreen_size[0], window.fullscreen_size[1]))
 sky.set_shader_input('sun_size', 0.1 * 0.1)
 
-time_scale_text = Text(text=f'Time Scale: {LivingThing.time_scale:.1f}', position=(0.45, -0.45), origin=(0.5, -0.5), scale=1)
+time_scale_text = Text(text=f'Time Scale: {clock.time_scale:.1f}', position=(0.45, -0.45), origin=(0.5, -0.5), scale=1)
 game_time_text = Text(text='Game Time: d:00:00:00', position=(-0.45, -0.45), origin=(-0.5, -0.5), scale=1)
 
 normal_speed = 5
 sprint_speed = 10
 player.speed = normal_speed
 
+VIEW_RADIUS = 100  # Entities farther from the player are disabled
+
+def ground_height(x, z):
+    return heightfield.height(x, z) + 0.5
+
+# Living things are stepped together as arrays by one system, which also culls them and places
+# the visible ones, regrowing them every 30 simulation seconds. Fast-forward (F) steps it as often
+# as a frame allows and syncs twice a second
+system = LivingThing.system = LivingSystem(clock, focus=player, view_radius=VIEW_RADIUS, height_func=ground_height,
+                                           growth_interval=30.0, fast_forward_step=2.0,
+                                           fast_forward_budget=0.016, sync_interval=0.5)
+
 def input(key):
-    global LivingThing
     if key == 'p':
-        LivingThing.time_scale = 0
+        clock.time_scale = 0
     elif key == 'up arrow':
-        LivingThing.time_scale = min(LivingThing.time_scale + 1, 100)
+        clock.time_scale = min(clock.time_scale + 1, 100)
     elif key == 'down arrow':
-        LivingThing.time_scale = max(LivingThing.time_scale - 1, 0)
+        clock.time_scale = max(clock.time_scale - 1, 0)
     elif key == 'right arrow':
-        LivingThing.time_scale = min(LivingThing.time_scale + 0.1, 100.0)
+        clock.time_scale = min(clock.time_scale + 0.1, 100.0)
     elif key == 'left arrow':
-        LivingThing.time_scale = max(LivingThing.time_scale - 0.1, 0.0)
+        clock.time_scale = max(clock.time_scale - 0.1, 0.0)
     elif key == '0':
-        LivingThing.time_scale = 1
+        clock.time_scale = 1
     elif key in '123456789':
         increment = int(key) * 100
-        LivingThing.time_scale = min(LivingThing.time_scale + increment, 100000)
+        clock.time_scale = min(clock.time_scale + increment, 100000)
+    elif key == 'f':
+        system.set_fast_forward(not system.fast_forward)
     elif key == 'escape':
         application.quit()
     if held_keys['shift']:
@@ -188,7 +132,7 @@ def spawn_new():
         """Returns a valid spawn position at terrain height"""
         sx = px + random.uniform(-spawn_radius, spawn_radius)
         sz = pz + random.uniform(-spawn_radius, spawn_radius)
-        sy = get_terrain_height(sx, sz, height_scale) + 0.5  # Slight offset to prevent sinking
+        sy = heightfield.height(sx, sz) + 0.5  # Slight offset to prevent sinking
         return Vec3(sx, sy, sz)
 
     if random.random() < 0.05:
@@ -200,14 +144,8 @@ def spawn_new():
     if random.random() < 0.02:
         animals.append(Animal(position=get_spawn_position(), animal_type='predator', shader=lit_with_shadows_shader))
 
-def update_entity_grid():
-    if any(e.enabled != LivingThing.entity_grid.get(e.grid_key, [None, None, False])[2] for e in trees + animals):
-        LivingThing.entity_grid = {k: v for k, v in LivingThing.entity_grid.items() if v[2]}
-
 def update():
     global game_start_time, sun, sky, last_spawn_time
-    time_scale_text.text = f'Time Scale: {LivingThing.time_scale:.1f}'
-
     # Filter out destroyed entities every frame
     trees[:] = [t for t in trees if not t.destroyed]
     animals[:] = [a for a in animals if not a.destroyed]
@@ -215,17 +153,18 @@ def update():
     # Spawn lockout: only spawn every 1 second
     current_time = time.time()
     if current_time - last_spawn_time > 0.05:
-        spawn_new()
+        spawn_new()  # New living things join the system themselves
         last_spawn_time = current_time
 
-    update_entity_grid()
-
-    # Distance-based culling: disable updates for entities far from player
-    for entity in trees + animals:
-        dist = distance(player.position, entity.position)
-        entity.enabled = dist < 100  # Only update entities within 100 units
-
-    game_start_time += time.dt * LivingThing.time_scale
+    if system.fast_forward:
+        # The system steps the batch and moves the clock on itself after this function
+        time_scale_text.text = f'Fast-forward: {system.simulated / max(time.dt, 1e-6):.0f}x'
+        game_start_time = clock.time
+    else:
+        time_scale_text.text = clock.scale_label() + (' - F to fast-forward' if clock.limited else '')
+        clock.advance(time.dt)  # The system runs these steps when it updates, after this function
+        scheduler.advance(clock.time)
+        game_start_time = clock.render_time
     normalized_time = (game_start_time % 86400) / 86400.0
     angle_degrees = normalized_time * 360 - 90
     angle_radians = math.radians(angle_degrees)
@@ -252,9 +191,4 @@ def update():
     sky.set_shader_input('time', game_start_time % 86400)
     sky.set_shader_input('sun_size', 0.1 * 0.1)
 
-    # Keep animals on the terrain
-    for animal in animals:
-        if animal.enabled:
-            animal.y = get_terrain_height(animal.x, animal.z, height_scale) + 0.5
-
 app.run()
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Occupancy grid of living things, keyed by integer handles.
+
+Every registered thing gets a handle: its slot in the registry in the low 32 bits and the
+slot's generation in the high bits. Unregistering bumps the generation, so a handle left
+behind anywhere (a cell nobody cleared, a batch row) no longer resolves and reads as empty,
+and the slot is reused by the next registration.
+
+Cells are one world unit (cell_size) square. Cells within `extent` of the origin live in a
+dense NumPy array, so looking up a cell is one array index; cells beyond fall back to a dict.
+A cell holds at most one handle, the last one placed there. Things update the grid themselves
+as they spawn, move and die; nothing rebuilds it.
+
+Example:
+    cell = grid.cell(x, z)
+    if grid.occupant(cell) not in (EMPTY, thing.handle):
+        ...  # Blocked
+    grid.move(thing.handle, thing.cell, cell)
+"""
+
+import numpy as np
+
+EMPTY = -1
+_SLOT_BITS = 32
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+
+
+class OccupancyGrid:
+    """
+    Cells of the x/z plane holding integer handles of the things standing in them.
+    """
+
+    def __init__(self, cell_size=1.0, extent=256):
+        """
+        Parameters:
+            cell_size (float): Edge length of a cell.
+            extent (float): Cells within this distance of the origin (on both axes) are stored
+                densely; the rest go to a dict.
+        """
+        self.cell_size = cell_size
+        self.offset = int(np.ceil(extent / cell_size))
+        self.cells = np.full((2 * self.offset + 1, 2 * self.offset + 1), EMPTY, dtype=np.int64)
+        self.outside = {}  # (ix, iz) -> handle for cells beyond the dense array
+        self.things = []  # Slot -> registered thing, or None
+        self.generations = np.zeros(0, dtype=np.int64)
+        self.free = []  # Slots to reuse
+
+    def __len__(self):
+        return len(self.things) - len(self.free)
+
+    def register(self, thing):
+        """Returns a new handle for `thing`."""
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.things)
+            self.things.append(None)
+            if slot >= len(self.generations):
+                self.generations = np.concatenate((self.generations,
+                                                   np.zeros(max(slot, 64), dtype=np.int64)))
+        self.things[slot] = thing
+        return (int(self.generations[slot]) << _SLOT_BITS) | slot
+
+    def unregister(self, handle, cell=None):
+        """Retires `handle`, clearing `cell` if it still holds it; the handle stops resolving."""
+        if cell is not None:
+            self.clear(handle, cell)
+        if not self.valid(handle):
+            return
+        slot = handle & _SLOT_MASK
+        self.things[slot] = None
+        self.generations[slot] += 1
+        self.free.append(slot)
+
+    def valid(self, handle):
+        return handle >= 0 and self.generations[handle & _SLOT_MASK] == handle >> _SLOT_BITS
+
+    def get(self, handle):
+        """The thing `handle` belongs to, or None if it was unregistered."""
+        return self.things[handle & _SLOT_MASK] if self.valid(handle) else None
+
+    def cell(self, x, z):
+        """Integer coordinates of the cell holding (x, z)."""
+        return round(x / self.cell_size), round(z / self.cell_size)
+
+    def _index(self, cell):
+        ix, iz = cell[0] + self.offset, cell[1] + self.offset
+        size = len(self.cells)
+        return (ix, iz) if 0 <= ix < size and 0 <= iz < size else None
+
+    def occupant(self, cell):
+        """Handle of the live thing in `cell`, or EMPTY."""
+        index = self._index(cell)
+        handle = int(self.cells[index]) if index is not None else self.outside.get(cell, EMPTY)
+        return handle if handle != EMPTY and self.valid(handle) else EMPTY
+
+    def place(self, handle, cell):
+        index = self._index(cell)
+        if index is not None:
+            self.cells[index] = handle
+        else:
+            self.outside[cell] = handle
+
+    def clear(self, handle, cell):
+        """Empties `cell` if `handle` is the one in it."""
+        index = self._index(cell)
+        if index is not None:
+            if self.cells[index] == handle:
+                self.cells[index] = EMPTY
+        elif self.outside.get(cell) == handle:
+            del self.outside[cell]
+
+    def move(self, handle, old_cell, new_cell):
+        if old_cell != new_cell:
+            self.clear(handle, old_cell)
+            self.place(handle, new_cell)
+
+    def cells_of(self, x, z):
+        """Vectorized cell(): integer cell coordinates of arrays x and z, shaped (n, 2)."""
+        return np.column_stack((np.rint(np.asarray(x) / self.cell_size),
+                                np.rint(np.asarray(z) / self.cell_size))).astype(np.int64)
+
+    def move_many(self, handles, old_cells, new_cells):
+        """
+        Vectorized move() of many handles at once; old_cells and new_cells are shaped (n, 2).
+        Where several handles move into one cell, one of them ends up holding it.
+        """
+        moved = (old_cells != new_cells).any(axis=1)
+        if not moved.any():
+            return
+        handles, old_cells, new_cells = handles[moved], old_cells[moved], new_cells[moved]
+        size = len(self.cells)
+        old_index = old_cells + self.offset
+        new_index = new_cells + self.offset
+        old_inside = ((old_index >= 0) & (old_index < size)).all(axis=1)
+        new_inside = ((new_index >= 0) & (new_index < size)).all(axis=1)
+
+        # A cell holds one handle, so clearing only cells still holding their own never collides
+        ix, iz = old_index[old_inside, 0], old_index[old_inside, 1]
+        own = self.cells[ix, iz] == handles[old_inside]
+        self.cells[ix[own], iz[own]] = EMPTY
+        self.cells[new_index[new_inside, 0], new_index[new_inside, 1]] = handles[new_inside]
+
+        # Cells beyond the dense array are rare; they go one by one
+        for handle, cell in zip(handles[~old_inside].tolist(), old_cells[~old_inside].tolist()):
+            self.clear(handle, tuple(cell))
+        for handle, cell in zip(handles[~new_inside].tolist(), new_cells[~new_inside].tolist()):
+            self.place(handle, tuple(cell))
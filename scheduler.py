@@ -0,0 +1,126 @@
+"""
+Simulation-time event scheduler (a timing wheel).
+
+Rare per-entity events, such as a living thing dying or an animal falling asleep, are
+scheduled once for the simulation time they happen at instead of being detected by counting
+down a timer on every tick. The wheel is a ring of buckets, each covering `resolution`
+seconds; scheduling is an append to the bucket of the event's time, and advancing the clock
+only visits the buckets it passes. Events too far ahead for the ring wait in a heap until
+the ring reaches them.
+
+Events are fired in batches: all events due by the time advance() is called are grouped by
+callback, and each callback is called once with the list of their items.
+
+Example:
+    scheduler.schedule(thing.death_time, LivingThing.expire, thing)
+    ...
+    scheduler.advance(clock.time)  # Calls LivingThing.expire([every thing that died])
+"""
+
+import heapq
+import itertools
+import math
+
+
+class Event:
+    """A scheduled call; cancel() it to keep it from firing."""
+
+    __slots__ = ('time', 'callback', 'item', 'cancelled')
+
+    def __init__(self, time, callback, item):
+        self.time = time
+        self.callback = callback
+        self.item = item
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Timing wheel of events keyed by simulation time.
+    """
+
+    def __init__(self, resolution=0.25, slots=1024, start_time=0.0):
+        """
+        Parameters:
+            resolution (float): Simulation seconds covered by one bucket.
+            slots (int): Buckets in the ring; events more than resolution * slots ahead wait in a heap.
+            start_time (float): Simulation time to start at.
+        """
+        self.resolution = resolution
+        self.buckets = [[] for _ in range(slots)]
+        self.overflow = []  # (time, sequence, Event) heap of events beyond the ring
+        self.sequence = itertools.count()
+        self.time = start_time
+        self.cursor = math.floor(start_time / resolution)  # Absolute index of the current bucket
+        self.pending = 0  # Events scheduled and not fired yet, cancelled ones included
+
+    def __len__(self):
+        return self.pending
+
+    def schedule(self, time, callback, item):
+        """
+        Schedules callback([item, ...]) for simulation time `time`. Events already due fire on
+        the next advance().
+
+        Returns:
+            Event: Handle to cancel the event with.
+        """
+        event = Event(time, callback, item)
+        self._insert(event)
+        self.pending += 1
+        return event
+
+    def _insert(self, event):
+        index = max(math.floor(event.time / self.resolution), self.cursor)
+        if index - self.cursor >= len(self.buckets):
+            heapq.heappush(self.overflow, (event.time, next(self.sequence), event))
+        else:
+            self.buckets[index % len(self.buckets)].append(event)
+
+    def advance(self, time):
+        """
+        Moves to simulation time `time`, firing every event due by then.
+
+        Returns:
+            int: Number of events fired.
+        """
+        due = []
+        target = math.floor(time / self.resolution)
+        size = len(self.buckets)
+
+        # Buckets wholly in the past are emptied; skipping more than a full turn empties them all
+        passed = range(self.cursor, target) if target - self.cursor < size else range(size)
+        for index in passed:
+            bucket = self.buckets[index % size]
+            due.extend(bucket)
+            bucket.clear()
+        # The current bucket is only partly due
+        bucket = self.buckets[target % size]
+        if bucket:
+            due.extend(event for event in bucket if event.time <= time)
+            bucket[:] = [event for event in bucket if event.time > time]
+        self.cursor = max(self.cursor, target)
+        self.time = time
+
+        # Events the ring has caught up with leave the heap
+        while self.overflow and math.floor(self.overflow[0][0] / self.resolution) - self.cursor < size:
+            event = heapq.heappop(self.overflow)[2]
+            if event.time <= time:
+                due.append(event)
+            else:
+                self._insert(event)
+
+        self.pending -= len(due)
+        return self._fire(due)
+
+    def _fire(self, due):
+        batches = {}
+        for event in sorted(due, key=lambda event: event.time):
+            if not event.cancelled:
+                batches.setdefault(event.callback, []).append(event.item)
+        for callback, items in batches.items():
+            callback(items)
+        return sum(len(items) for items in batches.values())